@@ -1,24 +1,33 @@
 import os
 import logging
+import threading
 from utils.downloaders import download_video_if_needed
-from utils.processors import detect_scenes
-from utils.render import prepare_shorts
-from utils.transcribers import get_transcript
-from utils.youtube import get_youtube_service
-from utils.uploader import upload_videos
+from utils.processors import detect_scenes, analyze_source
+from utils.render import prepare_shorts, iter_shorts, all_scenes_done
+from utils.transcribers import get_transcript, get_official_transcript, uses_extracted_audio
+from utils.youtube import get_youtube_service, get_cached_youtube_service
+from utils.uploader import upload_videos, render_and_upload, drain_upload_queue, index_scenes
+from utils.checkpoint import RunManifest, quick_file_hash, fingerprint, get_downloaded_path, set_downloaded_path
+from utils.pipeline import Stage, run_stages
+from utils.jobs import JobQueue, JobWorkers, read_inputs, scan_inbox
+from utils.daemon import serve
 import utils.config as config
 from moviepy import VideoFileClip
 import sys
+import argparse
 
 # Configure logging
 logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
-def main(input: str) -> bool:
+def main(input: str, cancel_event: threading.Event = None) -> bool:
     """
-    The main function.
-    1. Downloads the video
-    2. Gets the transcript
-    3. Detects scenes
-    4. Prepares and uploads shorts
+    The main function. Stages completed by a previous run on the same video are skipped.
+    1. Downloads the video, while looking up the official transcript
+    2. Gets the transcript and detects scenes, at the same time
+    3. Prepares and uploads shorts
+    Args:
+        input: str: YouTube link or path to a video file.
+        cancel_event: threading.Event: Set it from another thread to stop rendering after the current scene
+            and skip the following stages; the shorts rendered so far are still uploaded.
     """
     config.check_config()  # Check if the configuration is correct
     logging.info("Configuration is correct, starting the process...")
@@ -30,41 +39,151 @@ def main(input: str) -> bool:
     model = config.PREFERRED_MODELS.get(transcriber, None)
 
     # You need to have the client_secret.json file in the same directory as this script.
-    # If you don't, you can download it from the Google Cloud Console. An invalid client_secret.json will cause an error.
-    youtube_service = get_youtube_service()
+    # If you don't, you can download it from the Google Cloud Console. An invalid client_secret.json will cause an error.
+    # Cached per thread, consecutive jobs of a batch reuse it
+    youtube_service = get_cached_youtube_service()
     if not youtube_service:
         logging.error("YouTube service object is None. Exiting upload.")
         return False
-    # Download Video
-    downloaded_path = download_video_if_needed(input)
-    if not downloaded_path:
-        logging.error("Could not find video. Exiting.")
-        return False
 
-    # Get transcript
-    transcript = get_transcript(downloaded_path=downloaded_path, video_url = input, transcriber=transcriber, model=model, assemblyai_token=assemblyai_token)
-    if not transcript:
-        logging.error("Could not get transcript. Exiting.")
-        return False
-    
-    # Detect scenes
-    scene_timestamps = detect_scenes(downloaded_path, threshold=0.8)
-    if not scene_timestamps:
-        logging.error("Could not detect scenes. Exiting.")
-        return False
+    def download(results: dict) -> dict:
+        downloaded_path = get_downloaded_path(input)
+        if not downloaded_path:
+            downloaded_path = download_video_if_needed(input)
+            if downloaded_path and downloaded_path != input:
+                set_downloaded_path(input, downloaded_path)
+        if not downloaded_path:
+            logging.error("Could not find video. Exiting.")
+            return None
+        # Completed stages are recorded next to the video, a rerun picks up where the previous one stopped
+        target = os.path.dirname(downloaded_path)
+        return {"path": downloaded_path, "target": target, "manifest": RunManifest(target),
+                "source_hash": quick_file_hash(downloaded_path)}
 
-    # Convert to multiple scene shorts with vertical 9x16 with brainrot footage and subtitles
-    target = os.path.dirname(downloaded_path)
-    with VideoFileClip(downloaded_path) as clip:
-        final_videos = prepare_shorts(clip = clip, timestamps=scene_timestamps, transcript=transcript, base_output_path=target)
+    def transcript_inputs(results: dict) -> dict:
+        return {"source": results["download"]["source_hash"], "transcriber": transcriber, "model": model}
 
-    # Upload videos
-    success = upload_videos(videos=final_videos,
-                            target=target,
-                            youtube_service=youtube_service,
-                            delete_after_upload=delete_after_upload)
-    if not success:
-        logging.error("Upload process failed. Exiting.")
+    def scene_inputs(results: dict) -> dict:
+        # Every setting that changes the cuts, so changing one detects the scenes again
+        inputs = {
+            "source": results["download"]["source_hash"],
+            "threshold": config.SCENE_THRESHOLD,
+            "single_pass": config.SINGLE_PASS_ANALYSIS,
+            "mode": config.SCENE_DETECTION_MODE,
+            "shards": config.SCENE_DETECTION_SHARDS,
+            "shard_overlap": config.SCENE_SHARD_OVERLAP if config.SCENE_DETECTION_SHARDS > 1 else None,
+        }
+        if config.SCENE_DETECTION_MODE == "fast":
+            inputs.update(analysis_width=config.SCENE_ANALYSIS_WIDTH, analysis_fps=config.SCENE_ANALYSIS_FPS,
+                          keyframes_only=config.SCENE_KEYFRAMES_ONLY, refine_window=config.SCENE_REFINE_WINDOW)
+        return inputs
+
+    def analyze(results: dict) -> dict:
+        # Read the source once for the audio, the scene cuts and the duration
+        source, manifest = results["download"], results["download"]["manifest"]
+        # The WAV is only written if the transcription stage will read it
+        needs_audio = (not results["official_transcript"] and not manifest.get_transcript(transcript_inputs(results))
+                       and uses_extracted_audio(transcriber))
+        if not needs_audio and manifest.get_stage("scenes", scene_inputs(results)):
+            return None
+        audio_path = os.path.splitext(source["path"])[0] + ".wav" if needs_audio else None
+        return analyze_source(source["path"], audio_path, threshold=config.SCENE_THRESHOLD)
+
+    def transcribe(results: dict) -> list[dict]:
+        if results["official_transcript"]:
+            return results["official_transcript"]
+        manifest = results["download"]["manifest"]
+        transcript = manifest.get_transcript(transcript_inputs(results))
+        if transcript:
+            return transcript
+        analysis = results.get("analysis")
+        transcript = get_transcript(downloaded_path=results["download"]["path"], video_url = input, transcriber=transcriber, model=model,
+                                    assemblyai_token=assemblyai_token, audio_path=analysis["audio_path"] if analysis else None,
+                                    check_official=False)
+        if not transcript:
+            logging.error("Could not get transcript. Exiting.")
+            return None
+        manifest.set_transcript(transcript_inputs(results), transcript)
+        return transcript
+
+    def detect(results: dict) -> list:
+        manifest = results["download"]["manifest"]
+        scene_timestamps = manifest.get_stage("scenes", scene_inputs(results))
+        if scene_timestamps:
+            return scene_timestamps
+        analysis = results.get("analysis")
+        if analysis:
+            scene_timestamps = analysis["timestamps"]
+        else:
+            scene_timestamps = detect_scenes(results["download"]["path"], threshold=config.SCENE_THRESHOLD)
+        if not scene_timestamps:
+            logging.error("Could not detect scenes. Exiting.")
+            return None
+        manifest.set_stage("scenes", scene_inputs(results), scene_timestamps)
+        return scene_timestamps
+
+    def render(results: dict) -> list[tuple] | bool:
+        # Convert to multiple scene shorts with vertical 9x16 with brainrot footage and subtitles.
+        # Returns True instead of the shorts when a previous run already rendered and uploaded every scene
+        source, transcript = results["download"], results["transcript"]
+        render_inputs = {
+            "source": source["source_hash"],
+            "transcript": fingerprint(transcript),
+            "backend": config.RENDER_BACKEND,
+            "subtitle_mode": config.SUBTITLE_MODE,
+            "resolution": [1080, 1920],
+            "games": sorted(config.brainrot_footage),  # Each scene draws its footage from these
+            "footage_proxies": config.USE_FOOTAGE_PROXIES,
+            "precut": config.PRECUT_SCENES,
+        }
+        if all_scenes_done(results["scenes"], source["manifest"], render_inputs):
+            logging.info("Every scene was already rendered and uploaded by a previous run. Nothing to do.")
+            return True
+        with VideoFileClip(source["path"]) as clip:
+            if not config.STREAM_UPLOADS:
+                return prepare_shorts(clip = clip, timestamps=results["scenes"], transcript=transcript, base_output_path=source["target"],
+                                      source_path=source["path"], workers=config.RENDER_WORKERS,
+                                      backend=config.RENDER_BACKEND, manifest=source["manifest"], render_inputs=render_inputs,
+                                      cancel_event=cancel_event)
+            # Upload each short as soon as it is rendered
+            scenes = iter_shorts(clip = clip, timestamps=results["scenes"], transcript=transcript, base_output_path=source["target"],
+                                 source_path=source["path"], workers=config.RENDER_WORKERS,
+                                 backend=config.RENDER_BACKEND, manifest=source["manifest"], render_inputs=render_inputs,
+                                 cancel_event=cancel_event)
+            success = render_and_upload(scenes, target=source["target"], youtube_service=youtube_service,
+                                        delete_after_upload=delete_after_upload, queue_size=config.UPLOAD_QUEUE_SIZE)
+            if not success:
+                logging.error("Upload process failed. Exiting.")
+            return success
+
+    def upload(results: dict) -> bool:
+        if results["render"] is True:
+            return True  # Nothing was left to render or upload
+        success = upload_videos(videos=results["render"],
+                                target=results["download"]["target"],
+                                youtube_service=youtube_service,
+                                delete_after_upload=delete_after_upload)
+        if not success:
+            logging.error("Upload process failed. Exiting.")
+        return success
+
+    # Transcription and scene detection only depend on the download, they run at the same time
+    analysis_deps = ("analysis",) if config.SINGLE_PASS_ANALYSIS else ()
+    stages = [
+        Stage("official_transcript", lambda results: get_official_transcript(input), required=False),
+        Stage("download", download),
+        Stage("transcript", transcribe, deps=("download", "official_transcript") + analysis_deps),
+        Stage("scenes", detect, deps=("download",) + analysis_deps),
+        Stage("render", render, deps=("transcript", "scenes")),
+    ]
+    if not config.STREAM_UPLOADS:
+        # Also after a cancel or Ctrl-C: the shorts rendered until then are uploaded
+        stages.append(Stage("upload", upload, deps=("download", "render"), run_if_cancelled=True))
+    if config.SINGLE_PASS_ANALYSIS:
+        stages.append(Stage("analysis", analyze, deps=("download", "official_transcript"), required=False))
+
+    cancel_event = cancel_event or threading.Event()  # Set by run_stages on Ctrl-C, rendering stops between scenes
+    if not run_stages(stages, max_workers=config.PIPELINE_WORKERS, cancel_event=cancel_event):
         return False
     logging.info("Upload process completed successfully.")
     return True
@@ -92,6 +211,7 @@ def main_upload_only(scenes_directory: str) -> bool:
     target = os.path.dirname(scenes_directory)
     video_list = sorted(os.listdir(scenes_directory))
     video_list = [os.path.join(scenes_directory, video) for video in video_list if video.endswith(".mp4")] #Include only .mp4 files
+    video_list = index_scenes(video_list)  # Part numbers come from the scene file names
 
     # Main loop to upload videos
     success = upload_videos(videos=video_list,
@@ -104,9 +224,89 @@ def main_upload_only(scenes_directory: str) -> bool:
     logging.info("Upload process completed successfully.")
     return True
 
+def main_drain_queue() -> bool:
+    """
+    Uploads the scenes queued because the daily quota ran out, as far as today's quota allows.
+    Run it once a day (e.g. from cron) after midnight Pacific time.
+    """
+    uploaded = drain_upload_queue(delete_after_upload=config.DELETE_AFTER_UPLOAD)
+    return uploaded >= 0
+
+def main_batch(inputs: list[str] = None, inbox: str = None, jobs: int = None) -> bool:
+    """
+    Processes many inputs in one process, so the YouTube service, the transcription models and the
+    footage proxies are loaded once and shared by all jobs. Inputs are kept in a persistent job queue
+    (config.JOBS_FILE): jobs left over by an interrupted batch are picked up by the next one.
+    Args:
+        inputs: list[str]: YouTube links, video paths, or .txt files with one input per line.
+        inbox: str: Directory watched for new video files, each one is queued as a job. Runs until interrupted.
+        jobs: int: Number of jobs processed at the same time. Defaults to config.BATCH_JOBS.
+    Returns:
+        bool: True if every job processed in this run succeeded.
+    """
+    jobs = jobs or config.BATCH_JOBS
+    queue = JobQueue()
+    queue.requeue_interrupted()
+    for input in read_inputs(inputs or []):
+        if queue.add(input):
+            logging.info(f"Queued {input}")
+    if inbox:
+        os.makedirs(inbox, exist_ok=True)
+        scan_inbox(inbox, queue)
+
+    workers = JobWorkers(queue, lambda input, cancel_event: main(input, cancel_event=cancel_event), jobs=jobs,
+                         keep_running=bool(inbox), poll_seconds=config.INBOX_POLL_SECONDS)
+    workers.start()
+    try:
+        while workers.is_alive():
+            if inbox:
+                scan_inbox(inbox, queue)
+            workers.stop_event.wait(config.INBOX_POLL_SECONDS if inbox else 1.0)
+    except KeyboardInterrupt:
+        logging.warning("Interrupted, finishing the running stages. Unfinished jobs stay queued.")
+        workers.stop()
+    workers.join()
+    logging.info(f"Batch finished: {len(queue.list('done'))} done, {len(queue.list('queued'))} queued, "
+                 f"{len(queue.list('failed'))} failed in total.")
+    return not workers.failures
+
+def main_daemon(jobs: int = None):
+    """
+    Runs as a daemon: jobs are submitted, followed and cancelled over a local HTTP API
+    (see utils/daemon.py), and the loaded models and YouTube service are kept between jobs.
+    Args:
+        jobs: int: Number of jobs processed at the same time. Defaults to config.BATCH_JOBS.
+    """
+    config.check_config()
+    serve(lambda input, cancel_event: main(input, cancel_event=cancel_event), jobs=jobs)
+
 if __name__ == "__main__":
-    if len(sys.argv) == 3 and sys.argv[2] == "--upload-only":
-        scenes_directory = sys.argv[1]
+    parser = argparse.ArgumentParser(description="Turn videos into YouTube shorts and upload them.")
+    parser.add_argument("inputs", nargs="*", help="YouTube link or video path. With --upload-only, the scenes directory. "
+                                                   "With --batch, any number of inputs or .txt files listing them.")
+    parser.add_argument("--upload-only", action="store_true", help="Upload the scene videos of a directory")
+    parser.add_argument("--drain-queue", action="store_true", help="Upload the scenes queued for lack of quota")
+    parser.add_argument("--batch", action="store_true", help="Process the inputs through the persistent job queue")
+    parser.add_argument("--inbox", default=None, help="Batch mode: directory watched for new video files")
+    parser.add_argument("--jobs", type=int, default=None, help="Batch and daemon mode: jobs processed at the same time")
+    parser.add_argument("--daemon", action="store_true", help="Run as a daemon accepting jobs over a local HTTP API")
+    args = parser.parse_args()
+
+    if args.daemon:
+        main_daemon(jobs=args.jobs)
+        sys.exit(0)
+
+    if args.drain_queue:
+        success = main_drain_queue()
+        sys.exit(0 if success else 1)
+    if args.batch or args.inbox:
+        success = main_batch(args.inputs, inbox=args.inbox, jobs=args.jobs)
+        sys.exit(0 if success else 1)
+    if len(args.inputs) != 1 or not args.inputs[0]:
+        logging.error("Please provide a video URL or path to a video file.")
+        sys.exit(1)
+    if args.upload_only:
+        scenes_directory = args.inputs[0]
         success = main_upload_only(scenes_directory)
         if success:
             logging.info("Upload process completed successfully.")
@@ -114,17 +314,11 @@ if __name__ == "__main__":
         else:
             logging.error("Upload process failed.")
             sys.exit(1)
-    if len(sys.argv) < 2:
-        logging.error("Please provide a video URL or path to a video file.")
-        sys.exit(1)
-    input_link = sys.argv[1]
-    if not input_link:
-        logging.error("Please provide a video URL or path to a video file.")
-        sys.exit(1)
+    input_link = args.inputs[0]
     success = main(input_link)
     if success:
         logging.info("Process completed successfully.")
         sys.exit(0)
     else:
         logging.error("Process failed.")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -0,0 +1,128 @@
+from moviepy import TextClip, ImageClip
+from collections import OrderedDict
+import numpy as np
+import hashlib
+import logging
+import os
+import threading
+import utils.config as config
+
+class CaptionCache:
+    """
+    Bounded LRU cache of rasterized captions, keyed by text and styling.
+    Stores the RGB image and the mask of each caption, so a repeated word is
+    rasterized once per run (or once ever, with a cache directory) instead of once per occurrence.
+    Thread-safe: the jobs of a batch render in threads of one process and share the cache.
+    """
+
+    def __init__(self, max_entries: int = 512, cache_dir: str = None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _disk_path(self, key: tuple) -> str:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.npz")
+
+    def _load(self, key: tuple) -> tuple:
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                return data["image"], data["mask"]
+        except Exception as e:
+            logging.warning(f"Could not read cached caption {path}: {e}")
+            return None
+
+    def _store(self, key: tuple, image: np.ndarray, mask: np.ndarray):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        try:
+            np.savez(tmp_path, image=image, mask=mask)
+            os.replace(tmp_path, path)  # Atomic, other processes never see a partial file
+        except OSError as e:
+            logging.warning(f"Could not persist caption to {path}: {e}")
+
+    def get(self, text: str, font: str = "Arial", font_size: int = 60, color: str = "white",
+            stroke_color: str = "black", stroke_width: int = 2) -> ImageClip:
+        """
+        Returns a caption clip with the given text and styling, rasterizing it only if it is not cached.
+
+        Returns:
+            ImageClip: The caption, with its transparency as a mask.
+        """
+        key = (text, font, font_size, color, stroke_color, stroke_width)
+        with self._lock:
+            cached = self.entries.get(key)
+            if cached is not None:
+                self.hits += 1
+                self.entries.move_to_end(key)
+        if cached is None:
+            # Loaded or rasterized outside the lock, threads only wait for each other on the dict itself
+            cached = self._load(key)
+            disk_hit = cached is not None
+            if not disk_hit:
+                txt_clip = TextClip(text=text, font=font, color=color, font_size=font_size,
+                                    stroke_color=stroke_color, stroke_width=stroke_width)
+                cached = (txt_clip.get_frame(0), txt_clip.mask.get_frame(0))
+                self._store(key, *cached)
+            with self._lock:
+                if disk_hit:
+                    self.disk_hits += 1
+                else:
+                    self.misses += 1
+                self.entries[key] = cached
+                self.entries.move_to_end(key)
+                if len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        image, mask = cached
+        return ImageClip(image).with_mask(ImageClip(mask, is_mask=True))
+
+    def stats(self) -> tuple:
+        """Returns the (hits, disk_hits, misses) counters."""
+        with self._lock:
+            return self.hits, self.disk_hits, self.misses
+
+    def add_stats(self, stats: tuple):
+        """Adds the counters reported by a render worker process."""
+        hits, disk_hits, misses = stats
+        with self._lock:
+            self.hits += hits
+            self.disk_hits += disk_hits
+            self.misses += misses
+
+    def log_stats(self):
+        """Logs the hit and miss counters of the cache."""
+        hits, disk_hits, misses = self.stats()
+        total = hits + disk_hits + misses
+        if not total:
+            return
+        logging.info(f"Caption cache: {hits} hits, {disk_hits} disk hits, {misses} misses "
+                     f"({(hits + disk_hits) / total:.0%} hit rate)")
+
+_caption_cache = None
+_cache_lock = threading.Lock()
+
+def get_caption_cache() -> CaptionCache:
+    """
+    Returns the caption cache shared by all scenes rendered in this process,
+    or None if it is disabled in the configuration.
+    """
+    global _caption_cache
+    if config.CAPTION_CACHE_SIZE <= 0:
+        return None
+    with _cache_lock:
+        if _caption_cache is None:
+            _caption_cache = CaptionCache(max_entries=config.CAPTION_CACHE_SIZE, cache_dir=config.CAPTION_CACHE_DIR)
+    return _caption_cache
@@ -0,0 +1,183 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime
+import utils.config as config
+from utils.locking import file_lock
+
+def quick_file_hash(path: str, sample_size: int = 1024 * 1024) -> str:
+    """
+    Returns a fingerprint of a file's content from its size and its first and last `sample_size` bytes.
+    Cheap enough for multi-GB sources, and changes whenever the file is replaced by a different one.
+    """
+    digest = hashlib.sha256()
+    size = os.path.getsize(path)
+    digest.update(str(size).encode("utf-8"))
+    with open(path, "rb") as f:
+        digest.update(f.read(sample_size))
+        if size > sample_size:
+            f.seek(max(sample_size, size - sample_size))
+            digest.update(f.read(sample_size))
+    return digest.hexdigest()
+
+def fingerprint(inputs: dict) -> str:
+    """Returns a stable hash of a stage's inputs."""
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def _write_json(path: str, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+class RunManifest:
+    """
+    Per-video record of the completed pipeline stages, stored next to the video in its output directory.
+    Each stage is saved with a fingerprint of its inputs; a rerun reuses a stage's outputs only
+    if the fingerprint still matches, and skips scenes that were already rendered.
+    """
+
+    FILE_NAME = "run_manifest.json"
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir or "."
+        self.path = os.path.join(self.output_dir, self.FILE_NAME)
+        self.data = {"stages": {}, "scenes": {}}
+        self._lock = threading.RLock()  # Stages running concurrently record their outputs in the same manifest
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Could not read run manifest {self.path}, starting from scratch: {e}")
+
+    def save(self):
+        with self._lock:
+            os.makedirs(self.output_dir, exist_ok=True)
+            _write_json(self.path, self.data)
+
+    def get_stage(self, name: str, inputs: dict):
+        """
+        Returns the recorded outputs of a stage, or None if it has not completed with these inputs.
+        """
+        stage = self.data["stages"].get(name)
+        if not stage or stage.get("fingerprint") != fingerprint(inputs):
+            return None
+        logging.info(f"Stage '{name}' already completed on {stage.get('completed_at')}. Skipping...")
+        return stage.get("outputs")
+
+    def set_stage(self, name: str, inputs: dict, outputs):
+        """Records the outputs of a completed stage."""
+        with self._lock:
+            self.data["stages"][name] = {
+                "fingerprint": fingerprint(inputs),
+                "inputs": inputs,
+                "outputs": outputs,
+                "completed_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            self.save()
+
+    def get_transcript(self, inputs: dict) -> list[dict]:
+        """Returns the transcript saved by a completed transcript stage, or None."""
+        outputs = self.get_stage("transcript", inputs)
+        if not outputs or not os.path.exists(outputs.get("path", "")):
+            return None
+        with open(outputs["path"], "r") as f:
+            return json.load(f)
+
+    def set_transcript(self, inputs: dict, transcript: list[dict]):
+        """Saves the transcript next to the manifest and records the transcript stage."""
+        path = os.path.join(self.output_dir, "transcript.json")
+        os.makedirs(self.output_dir, exist_ok=True)
+        _write_json(path, transcript)
+        self.set_stage("transcript", inputs, {"path": path})
+
+    def get_scene(self, i: int, inputs: dict) -> dict:
+        """
+        Returns the record of a scene rendered with these inputs, or None.
+        The record's "path" may no longer exist if the scene was uploaded and deleted.
+        """
+        scene = self.data["scenes"].get(str(i))
+        if not scene or scene.get("fingerprint") != fingerprint(inputs):
+            return None
+        return scene
+
+    def set_scene(self, i: int, inputs: dict, path: str):
+        """Records a rendered scene."""
+        with self._lock:
+            self.data["scenes"][str(i)] = {
+                "fingerprint": fingerprint(inputs),
+                "path": path,
+                "completed_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            self.save()
+
+def get_downloaded_path(input: str) -> str:
+    """
+    Returns the local path a previous run downloaded the input to, if the file is still there.
+    """
+    if not os.path.exists(config.DOWNLOAD_INDEX_FILE):
+        return None
+    try:
+        with open(config.DOWNLOAD_INDEX_FILE, "r") as f:
+            path = json.load(f).get(input)
+    except (OSError, ValueError):
+        return None
+    if path and os.path.isfile(path):
+        logging.info(f"Input already downloaded to {path}. Skipping download.")
+        return path
+    return None
+
+def set_downloaded_path(input: str, path: str):
+    """Records where an input was downloaded to."""
+    with file_lock(f"{config.DOWNLOAD_INDEX_FILE}.lock"):
+        index = {}
+        if os.path.exists(config.DOWNLOAD_INDEX_FILE):
+            try:
+                with open(config.DOWNLOAD_INDEX_FILE, "r") as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                index = {}
+        index[input] = os.path.abspath(path)
+        _write_json(config.DOWNLOAD_INDEX_FILE, index)
+
+def _upload_session_key(video_path: str) -> str:
+    """A session is only resumed for the same file: same path, size and modification time."""
+    stat = os.stat(video_path)
+    return f"{os.path.abspath(video_path)}|{stat.st_size}|{int(stat.st_mtime)}"
+
+def _update_upload_sessions(update):
+    with file_lock(f"{config.UPLOAD_SESSIONS_FILE}.lock"):
+        sessions = {}
+        if os.path.exists(config.UPLOAD_SESSIONS_FILE):
+            try:
+                with open(config.UPLOAD_SESSIONS_FILE, "r") as f:
+                    sessions = json.load(f)
+            except (OSError, ValueError):
+                sessions = {}
+        update(sessions)
+        _write_json(config.UPLOAD_SESSIONS_FILE, sessions)
+
+def get_upload_session(video_path: str) -> str:
+    """
+    Returns the resumable upload session URI a previous run recorded for this file, or None.
+    """
+    if not os.path.exists(config.UPLOAD_SESSIONS_FILE) or not os.path.exists(video_path):
+        return None
+    try:
+        with open(config.UPLOAD_SESSIONS_FILE, "r") as f:
+            return json.load(f).get(_upload_session_key(video_path))
+    except (OSError, ValueError):
+        return None
+
+def set_upload_session(video_path: str, uri: str):
+    """Records the resumable upload session URI of a file being uploaded."""
+    key = _upload_session_key(video_path)
+    _update_upload_sessions(lambda sessions: sessions.__setitem__(key, uri))
+
+def clear_upload_session(video_path: str):
+    """Forgets the upload session of a file, once it is uploaded or the session expired."""
+    key = _upload_session_key(video_path)
+    _update_upload_sessions(lambda sessions: sessions.pop(key, None))
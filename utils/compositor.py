@@ -0,0 +1,97 @@
+import sys
+import time
+import logging
+import argparse
+import numpy as np
+from moviepy import VideoClip, CompositeVideoClip
+
+class StackedCompositor:
+    """
+    Compositor of the fixed 9:16 layout of render(): the main clip on top, the footage below it,
+    together covering the whole frame. Each frame is written into one preallocated buffer with two
+    slice assignments, instead of CompositeVideoClip's generic per-frame blending with masks and new arrays.
+
+    Since every pixel of the buffer is overwritten for every frame, the same buffer is returned each time;
+    consumers must use (or copy) a frame before asking for the next one, as MoviePy's writers do.
+    """
+
+    def __init__(self, top: VideoClip, bottom: VideoClip, size: tuple=(1080, 1920)):
+        self.top = top
+        self.bottom = bottom
+        self.width, self.height = size
+        self.top_height = top.size[1]
+        self.buffer = np.empty((self.height, self.width, 3), dtype=np.uint8)
+
+    @staticmethod
+    def fits(top: VideoClip, bottom: VideoClip, size: tuple) -> bool:
+        """Returns True if the clips tile the frame: full width, heights adding up to the frame height."""
+        width, height = size
+        return top.size[0] == width and bottom.size[0] == width and top.size[1] + bottom.size[1] == height
+
+    def frame_function(self, t: float) -> np.ndarray:
+        self.buffer[:self.top_height] = self.top.get_frame(t)[..., :3]
+        self.buffer[self.top_height:] = self.bottom.get_frame(t)[..., :3]
+        return self.buffer
+
+    def clip(self) -> VideoClip:
+        """Returns the composited video, with the main clip's duration, frame rate and audio."""
+        video = VideoClip(frame_function=self.frame_function, duration=self.top.duration)
+        video = video.with_fps(self.top.fps)
+        if self.top.audio is not None:
+            video = video.with_audio(self.top.audio)
+        return video
+
+def stack_clips(top: VideoClip, bottom: VideoClip, size: tuple=(1080, 1920)) -> VideoClip:
+    """
+    Puts `top` above `bottom`. Uses the preallocated compositor when the clips exactly tile the frame
+    (the default layout), CompositeVideoClip otherwise.
+    """
+    if StackedCompositor.fits(top, bottom, size):
+        return StackedCompositor(top, bottom, size).clip()
+    logging.debug(f"Clips {top.size} and {bottom.size} do not tile {size}, using CompositeVideoClip.")
+    return CompositeVideoClip([top.with_position("top"), bottom.with_position("bottom")], size=size)
+
+def _noise_clip(size: tuple, duration: float, fps: float) -> VideoClip:
+    """A clip of random frames, cached so that decoding does not weigh in the benchmark."""
+    width, height = size
+    frames = np.random.randint(0, 256, (8, height, width, 3), dtype=np.uint8)
+    clip = VideoClip(frame_function=lambda t: frames[int(t * fps) % len(frames)], duration=duration)
+    return clip.with_fps(fps)
+
+def benchmark(frames: int = 120, size: tuple=(1080, 1920), top_height: int = 840) -> dict:
+    """
+    Measures the frames per second of CompositeVideoClip and of StackedCompositor on the default layout.
+
+    Returns:
+        dict: Frames per second of each compositor.
+    """
+    fps = 30
+    duration = frames / fps
+    width, height = size
+    top = _noise_clip((width, top_height), duration, fps)
+    bottom = _noise_clip((width, height - top_height), duration, fps)
+    times = [i / fps for i in range(frames)]
+    results = {}
+    for name, video in (
+        ("CompositeVideoClip", CompositeVideoClip([top.with_position("top"), bottom.with_position("bottom")], size=size)),
+        ("StackedCompositor", StackedCompositor(top, bottom, size).clip()),
+    ):
+        video.get_frame(0)  # Warm up
+        start = time.perf_counter()
+        for t in times:
+            video.get_frame(t)
+        results[name] = frames / (time.perf_counter() - start)
+    return results
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.compositor", description="Benchmark the 9:16 compositors.")
+    parser.add_argument("--frames", type=int, default=120, help="Frames composited by each compositor")
+    args = parser.parse_args(argv)
+    results = benchmark(args.frames)
+    for name, fps in results.items():
+        print(f"{name:<20} {fps:8.1f} frames/s")
+    print(f"Speedup: {results['StackedCompositor'] / results['CompositeVideoClip']:.1f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,18 +19,73 @@ MODELS = {
     "assemblyai": [None]
 }
 VOSK_DIRECTORY = "/path/to/vosk-models"  # Path to the directory where Vosk models are stored
+VOSK_MODE = "wav"  # wav, stream, parallel. stream pipes PCM from ffmpeg without a WAV file, parallel also splits the audio at silences across processes
+WHISPER_MODE = "single"  # single, parallel. parallel splits the audio at silences and transcribes the chunks across processes
+WHISPER_THREADS_PER_WORKER = 2  # Torch CPU threads of each parallel Whisper worker
+TRANSCRIBE_WORKERS = max(1, (os.cpu_count() or 1) // 2)  # Processes used by parallel transcription, each loads its own model
+TRANSCRIBE_CHUNK_SECONDS = 300  # Target chunk length for parallel transcription, chunks are cut in silences
+MODEL_MEMORY_BUDGET_MB = 8192  # Transcription models stay loaded between videos, least recently used ones are unloaded past this budget
 ASSEMBLYAI_API_KEY = os.getenv("ASSEMBLYAI_API_KEY")
 
+TRANSCRIPT_STORE_DIR = os.path.join(os.getcwd(), "transcripts")  # Reuse transcripts of the same audio across runs, set to None to disable
+TRANSCRIPT_STORE_MAX_BYTES = 512 * 1024 * 1024  # Least recently used transcripts are evicted past this size
+
 LOG_DIR = os.path.join(os.getcwd(), "logs")  # Create a "logs" directory in the current working directory
 os.makedirs(LOG_DIR, exist_ok=True)  # Ensure the directory exists
 
-UPLOAD_LOG_FILE = os.path.join(LOG_DIR, "uploaded_videos.log")
+LEDGER_FILE = os.path.join(LOG_DIR, "uploads.db")  # Upload ledger (SQLite): status, attempts and YouTube video ID of each short
+UPLOAD_LOG_FILE = os.path.join(LOG_DIR, "uploaded_videos.log")  # Legacy text logs, imported into the ledger on first use
 FAILED_UPLOAD_LOG_FILE = os.path.join(LOG_DIR, "failed_uploads.log")
+UPLOAD_SESSIONS_FILE = os.path.join(LOG_DIR, "upload_sessions.json")  # Resumable upload sessions, an interrupted upload continues where it stopped
+JOBS_FILE = os.path.join(LOG_DIR, "jobs.db")  # Persistent job queue of the batch mode (--batch, --inbox)
+DOWNLOAD_INDEX_FILE = os.path.join(LOG_DIR, "downloads.json")  # Maps each input URL to its downloaded file, so reruns skip the download
+
+SCENE_THRESHOLD = 0.8  # Scene change detection threshold, the higher the value, the less sensitive the detection
+SINGLE_PASS_ANALYSIS = False  # Extract the audio, detect scenes and read the duration in one ffmpeg pass over the source
+SCENE_DETECTION_MODE = "full"  # full, fast. fast analyzes a downscaled, frame-decimated stream, much faster on long high-resolution sources
+SCENE_DETECTION_SHARDS = 1  # Time ranges of the video analyzed concurrently by separate ffmpeg processes
+SCENE_SHARD_OVERLAP = 2.0  # Seconds each shard extends into its neighbours, cuts found twice are merged
+SCENE_ANALYSIS_WIDTH = 160  # fast mode: width of the analyzed frames
+SCENE_ANALYSIS_FPS = 5  # fast mode: analyzed frames per second. Lower is faster but can miss cuts between quick shots
+SCENE_KEYFRAMES_ONLY = False  # fast mode: decode keyframes only, fastest but cuts are only found at keyframes
+SCENE_REFINE_WINDOW = 1.0  # fast mode: seconds re-checked at full frame rate around each cut for a precise timestamp, 0 disables
+
+BATCH_JOBS = 1  # Batch mode: videos processed at the same time, in one process sharing the loaded models and YouTube service
+INBOX_POLL_SECONDS = 30  # Batch mode: how often the inbox directory is checked for new videos
+DAEMON_HOST = "127.0.0.1"  # Daemon mode (--daemon): address of the job API, keep it local, the API has no authentication
+DAEMON_PORT = 8765  # Daemon mode: port of the job API
+PIPELINE_WORKERS = 4  # Pipeline stages run at the same time (e.g. transcription and scene detection), 1 runs them one after the other
 
 DELETE_AFTER_UPLOAD = True  # Set to False if you want to keep the scene files after uploading
+QUOTA_PROJECT = None  # Google Cloud project the YouTube quota is counted against, defaults to the project_id of client_secret.json
+DAILY_QUOTA_UNITS = 10000  # YouTube Data API units per day, reset at midnight Pacific time
+UPLOAD_COST_UNITS = 1600  # Units consumed by one upload. Shorts that do not fit in today's quota are queued, see --drain-queue
+UPLOAD_MIN_INTERVAL = 1.0  # Minimum seconds between the starts of two upload requests
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # Bytes sent per upload request, must be a multiple of 256 KiB
+UPLOAD_MAX_RETRIES = 8  # Retries of a chunk after a network error or a 500/502/503/504 response, with exponential backoff
+STREAM_UPLOADS = False  # Upload each short as soon as it is rendered, instead of after all scenes are rendered
+UPLOAD_QUEUE_SIZE = 2  # STREAM_UPLOADS: rendered shorts waiting for upload at most, rendering pauses when the queue is full
+
+RENDER_WORKERS = 1  # Number of processes rendering scenes in parallel, 1 renders them one after another
+PRECUT_SCENES = False  # Copy each scene out of the source (no re-encode, cut at the previous keyframe) and render it from that small file
+PRECUT_PADDING = 0.5  # Seconds copied past the end of each pre-cut scene
+DISTRIBUTED_RENDER = False  # Queue the scenes for render workers on any host (python -m utils.render_queue worker) instead of rendering them here
+RENDER_QUEUE_FILE = os.path.join(LOG_DIR, "render_queue.db")  # Shared render queue, must be on storage every worker can reach
+RENDER_LEASE_SECONDS = 120  # A scene whose worker stops sending heartbeats for this long is given to another worker
+RENDER_MAX_ATTEMPTS = 3  # Render attempts per scene, across workers
+RENDER_POLL_SECONDS = 5  # How often idle workers and the waiting pipeline check the render queue
+RENDER_IDLE_TIMEOUT = 1800  # Seconds the pipeline waits while no worker renders any of its scenes before giving up, 0 waits forever
+RENDER_BACKEND = "moviepy"  # moviepy, ffmpeg. ffmpeg renders each scene with a single filtergraph, much faster on CPU
+USE_FOOTAGE_PROXIES = True  # Transcode each footage once into a pre-cropped 1080x1080 proxy at the output frame rate
+FOOTAGE_PROXY_DIR = os.path.join(os.getcwd(), "footage_proxies")  # Where the footage proxies are cached
+
+CAPTION_CACHE_SIZE = 512  # Max number of rasterized captions kept in memory (subtitle mode "clips"), 0 disables the cache
+CAPTION_CACHE_DIR = None  # Set to a directory (e.g. os.path.join(os.getcwd(), "caption_cache")) to keep captions across runs
+SUBTITLE_MODE = "clips"  # clips, ass. ass burns one generated subtitle track per scene instead of one text layer per word
 
-# Add your own brainrot footage links here, you can leave the "placeholder" as is, it will be replaced with the actual video path after it's downloaded.
+# Add your own brainrot footage links here, you can leave the "placeholder" as is. Downloaded footage is recorded in FOOTAGE_MANIFEST_FILE, not in this file.
 # The keys are the game names and the values are dictionaries with video names as keys and a list of video link and placeholder or video paths as values
+FOOTAGE_MANIFEST_FILE = os.path.join(os.getcwd(), "footage_manifest.json")  # Path, duration, resolution, fps and content hash of each downloaded footage
 
 brainrot_footage = {
     "subway_surfers": {
@@ -56,8 +111,38 @@ def check_config():
         raise ValueError("TRANSCRIBER must be one of 'whisper', 'vosk', or 'assemblyai'")
     if TRANSCRIBER == "assemblyai" and not ASSEMBLYAI_API_KEY:
         raise ValueError("ASSEMBLYAI_API_KEY must be set in the environment variables if using AssemblyAI")
+    if SCENE_DETECTION_MODE not in ["full", "fast"]:
+        raise ValueError("SCENE_DETECTION_MODE must be one of 'full' or 'fast'")
+    if not isinstance(SCENE_DETECTION_SHARDS, int) or SCENE_DETECTION_SHARDS < 1:
+        raise ValueError("SCENE_DETECTION_SHARDS must be a positive integer")
+    if WHISPER_MODE not in ["single", "parallel"]:
+        raise ValueError("WHISPER_MODE must be one of 'single' or 'parallel'")
+    if VOSK_MODE not in ["wav", "stream", "parallel"]:
+        raise ValueError("VOSK_MODE must be one of 'wav', 'stream', or 'parallel'")
     if TRANSCRIBER == "vosk" and (not VOSK_DIRECTORY or not os.path.exists(VOSK_DIRECTORY)):
         raise ValueError("VOSK_DIRECTORY must be set in utils/config.py")
+    if RENDER_BACKEND not in ["moviepy", "ffmpeg"]:
+        raise ValueError("RENDER_BACKEND must be one of 'moviepy' or 'ffmpeg'")
+    if SUBTITLE_MODE not in ["clips", "ass"]:
+        raise ValueError("SUBTITLE_MODE must be one of 'clips' or 'ass'")
+    if not isinstance(DAILY_QUOTA_UNITS, int) or not isinstance(UPLOAD_COST_UNITS, int) or UPLOAD_COST_UNITS < 1:
+        raise ValueError("DAILY_QUOTA_UNITS and UPLOAD_COST_UNITS must be integers, UPLOAD_COST_UNITS positive")
+    if not isinstance(UPLOAD_CHUNK_SIZE, int) or UPLOAD_CHUNK_SIZE <= 0 or UPLOAD_CHUNK_SIZE % (256 * 1024):
+        raise ValueError("UPLOAD_CHUNK_SIZE must be a positive multiple of 256 KiB (262144 bytes)")
+    if not isinstance(UPLOAD_MAX_RETRIES, int) or UPLOAD_MAX_RETRIES < 0:
+        raise ValueError("UPLOAD_MAX_RETRIES must be a non-negative integer")
+    if not isinstance(UPLOAD_QUEUE_SIZE, int) or UPLOAD_QUEUE_SIZE < 1:
+        raise ValueError("UPLOAD_QUEUE_SIZE must be a positive integer")
+    if not isinstance(BATCH_JOBS, int) or BATCH_JOBS < 1:
+        raise ValueError("BATCH_JOBS must be a positive integer")
+    if not isinstance(PIPELINE_WORKERS, int) or PIPELINE_WORKERS < 1:
+        raise ValueError("PIPELINE_WORKERS must be a positive integer")
+    if RENDER_LEASE_SECONDS <= 0 or not isinstance(RENDER_MAX_ATTEMPTS, int) or RENDER_MAX_ATTEMPTS < 1:
+        raise ValueError("RENDER_LEASE_SECONDS must be positive and RENDER_MAX_ATTEMPTS a positive integer")
+    if RENDER_IDLE_TIMEOUT < 0:
+        raise ValueError("RENDER_IDLE_TIMEOUT must be 0 (wait forever) or positive")
+    if not isinstance(RENDER_WORKERS, int) or RENDER_WORKERS < 1:
+        raise ValueError("RENDER_WORKERS must be a positive integer")
     if not brainrot_footage:
         raise ValueError("brainrot_footage must be set in utils/config.py")
     if not isinstance(brainrot_footage, dict):
@@ -0,0 +1,125 @@
+import re
+import json
+import signal
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import utils.config as config
+from utils.jobs import JobQueue, JobWorkers
+from utils.model_registry import get_model, loaded_models
+
+JOB_PATH = re.compile(r"^/jobs/(\d+)$")
+CANCEL_PATH = re.compile(r"^/jobs/(\d+)/cancel$")
+
+def preload_models():
+    """Loads the configured transcription model, so the first job does not pay for it."""
+    transcriber = config.TRANSCRIBER
+    model = config.PREFERRED_MODELS.get(transcriber)
+    if transcriber in ("whisper", "vosk") and model:
+        try:
+            get_model(transcriber, model)
+        except Exception as e:
+            logging.warning(f"Could not preload the {transcriber} model {model}: {e}")
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    JSON API of the daemon:
+        POST /jobs               {"input": "<link or path>"}  queue a job
+        GET  /jobs[?status=...]                               list the jobs
+        GET  /jobs/<id>                                       status of a job
+        POST /jobs/<id>/cancel                                cancel a job
+        GET  /health                                          liveness, loaded models
+    """
+
+    queue: JobQueue = None
+    workers: JobWorkers = None
+
+    def _send(self, status: int, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            data = json.loads(self.rfile.read(length))
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    def do_GET(self):
+        path, _, query = self.path.partition("?")
+        if path == "/health":
+            return self._send(200, {"status": "ok", "models": [list(key) for key in loaded_models()]})
+        if path == "/jobs":
+            params = dict(param.split("=", 1) for param in query.split("&") if "=" in param)
+            return self._send(200, self.queue.list(params.get("status")))
+        match = JOB_PATH.match(path)
+        if match:
+            job = self.queue.get(int(match.group(1)))
+            return self._send(200, job) if job else self._send(404, {"error": "job not found"})
+        self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        path = self.path.partition("?")[0]
+        if path == "/jobs":
+            data = self._read_json()
+            if not data or not isinstance(data.get("input"), str) or not data["input"].strip():
+                return self._send(400, {"error": "expected a JSON body with an 'input' link or path"})
+            input = data["input"].strip()
+            queued = self.queue.add(input)
+            job = self.queue.find(input)
+            logging.info(f"{'Queued' if queued else 'Already have'} job {job['id']}: {input}")
+            return self._send(201 if queued else 200, job)
+        match = CANCEL_PATH.match(path)
+        if match:
+            job_id = int(match.group(1))
+            if not self.queue.get(job_id):
+                return self._send(404, {"error": "job not found"})
+            if not self.workers.cancel(job_id):
+                return self._send(409, {"error": "job already finished", "job": self.queue.get(job_id)})
+            logging.info(f"Cancelling job {job_id}")
+            return self._send(202, self.queue.get(job_id))
+        self._send(404, {"error": "not found"})
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} - {format % args}")
+
+def serve(run, host: str = None, port: int = None, jobs: int = None):
+    """
+    Runs the daemon until SIGINT/SIGTERM: job workers that stay alive between jobs, fed by a local HTTP API.
+    The YouTube service (per worker thread), the transcription models and the footage proxies stay
+    loaded, so only the first job pays their startup cost.
+
+    Args:
+        run (callable): Runs one job, `run(input, cancel_event) -> bool`.
+        host (str): Address to listen on. Defaults to config.DAEMON_HOST (localhost only).
+        port (int): Port to listen on. Defaults to config.DAEMON_PORT.
+        jobs (int): Number of jobs run at the same time. Defaults to config.BATCH_JOBS.
+    """
+    queue = JobQueue()
+    queue.requeue_interrupted()
+    preload_models()
+    workers = JobWorkers(queue, run, jobs=jobs or config.BATCH_JOBS, keep_running=True, poll_seconds=1.0)
+    handler = type("Handler", (_Handler,), {"queue": queue, "workers": workers})
+    server = ThreadingHTTPServer((host or config.DAEMON_HOST, port or config.DAEMON_PORT), handler)
+
+    def shutdown(signum, frame):
+        logging.info("Shutting down, finishing the running stages. Unfinished jobs stay queued.")
+        workers.stop()
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    workers.start()
+    logging.info(f"Daemon listening on http://{server.server_address[0]}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        workers.join()
@@ -0,0 +1,150 @@
+import os
+import logging
+import subprocess
+import numpy as np
+from utils.processors import probe_video
+from utils.footage import get_footage_proxy, select_footage
+from utils.render import choose_game, get_local_transcript
+from utils.transcript_index import TranscriptIndex
+from utils.subtitles import escape_filter_text, subtitles_filter, write_ass
+import utils.config as config
+
+MAIN_CLIP_HEIGHT = 840  # Same as render(): leaves room for the subtitles above the footage
+SUBTITLE_Y = 780
+
+def build_subtitle_filters(local_transcript: list[dict]) -> list[str]:
+    """
+    Builds one drawtext filter per transcript entry, styled like the TextClips of subtitle_subclip.
+
+    Args:
+        local_transcript (list[dict]): Transcript entries in the scene's local time.
+
+    Returns:
+        list[str]: The drawtext filters, to be chained after the stacked video.
+    """
+    filters = []
+    for entry in local_transcript:
+        if entry["end"] <= entry["start"]:  # ensure non-zero duration
+            continue
+        text = escape_filter_text(entry["text"].strip())
+        if not text:
+            continue
+        filters.append(
+            f"drawtext=font=Arial:expansion=none:text={text}:fontsize=60:fontcolor=white"
+            f":borderw=2:bordercolor=black:x=(w-text_w)/2:y={SUBTITLE_Y}"
+            f":enable='between(t,{entry['start']:.3f},{entry['end']:.3f})'"
+        )
+    return filters
+
+def build_filter_complex(resolution: tuple, fps: float, subtitle_filters: list[str], footage_is_proxy: bool = False) -> str:
+    """
+    Builds the filtergraph of the 9:16 layout: main clip resized on top,
+    brainrot footage cropped and scaled below it, subtitles on top of both.
+
+    Args:
+        resolution (tuple): Tuple of the desired resolution of the video.
+        fps (float): Frame rate of the main clip, the footage is resampled to it.
+        subtitle_filters (list[str]): Filters applied to the stacked video.
+        footage_is_proxy (bool): The footage is a proxy that is already cropped, scaled and at the right frame rate.
+
+    Returns:
+        str: The filter_complex expression, with the final video labelled [v].
+    """
+    width, height = resolution
+    footage_height = height - MAIN_CLIP_HEIGHT
+    graph = [f"[0:v]scale={width}:{MAIN_CLIP_HEIGHT},setsar=1[top]"]
+    if footage_is_proxy:
+        graph.append("[1:v]setsar=1[bottom]")
+    else:
+        # Same steps as render(): keep the center 65%, scale to the footage height, crop the center
+        graph.append(f"[1:v]crop=trunc(iw*0.65/2)*2:ih,scale=-2:{footage_height},"
+                     f"crop={width}:{footage_height},setsar=1,fps={fps}[bottom]")
+    if subtitle_filters:
+        graph.append("[top][bottom]vstack=inputs=2[stacked]")
+        graph.append("[stacked]" + ",".join(subtitle_filters) + "[v]")
+    else:
+        graph.append("[top][bottom]vstack=inputs=2[v]")
+    return ";".join(graph)
+
+def render_scene_ffmpeg(source_path: str, start: float, end: float, i: int, scene_count: int,
+                        transcript: list[dict] | TranscriptIndex, output_dir: str, resolution: tuple=(1080, 1920),
+                        game: str = None, seed: int = None, subtitle_mode: str = None) -> str:
+    """
+    Renders, subtitles and saves a single scene with one ffmpeg invocation, without MoviePy compositing.
+    Produces the same layout as render_scene.
+
+    Args:
+        source_path (str): Path of the original video.
+        start (float): The start time of the scene.
+        end (float): The end time of the scene.
+        i (int): The index of the scene.
+        scene_count (int): The total number of scenes, used for logging.
+        transcript (list[dict] | TranscriptIndex): List of dictionaries containing subtitle information, or an index over it.
+        output_dir (str): The directory to save the scene to.
+        resolution (tuple): Tuple of the desired resolution of the video.
+        game (str): The game to get the footage for.
+        seed (int): Seed for the random footage selection.
+        subtitle_mode (str): "clips" or "ass". Defaults to config.SUBTITLE_MODE.
+
+    Returns:
+        str: The path of the saved scene.
+    """
+    if seed is not None:
+        np.random.seed(seed)
+    logging.info(f"Rendering scene {i+1} of {scene_count} from {start} to {end} with ffmpeg...")
+    duration = end - start
+    game = choose_game(game)
+    footage = select_footage(game)
+    if not footage:
+        logging.error("Failed to get brainrot footage.")
+        raise ValueError("Failed to get brainrot footage.")
+    footage_path = footage["path"]
+    source_info = probe_video(source_path)
+    if not source_info:
+        raise ValueError(f"Could not probe {source_path}.")
+    footage_is_proxy = False
+    if config.USE_FOOTAGE_PROXIES:
+        proxy_path = get_footage_proxy(footage_path, source_info["fps"], (resolution[0], resolution[1] - MAIN_CLIP_HEIGHT))
+        if proxy_path:
+            footage_path, footage_is_proxy = proxy_path, True
+
+    # Same trimming as render(): random window if the footage is long enough, loop it otherwise
+    footage_args = ["-stream_loop", "-1"]
+    duration_diff = footage["duration"] - duration
+    if duration_diff > 0:
+        footage_start = np.random.uniform(0, duration_diff)
+        logging.debug(f"Trimming brainrot clip to match main clip duration. Start time: {footage_start}, Duration: {duration}")
+        footage_args += ["-ss", f"{footage_start:.3f}"]
+
+    os.makedirs(output_dir, exist_ok=True)
+    out_path = f"{output_dir}/scene_{i+1}.mp4"
+    local_transcript = get_local_transcript(transcript or [], start, end)
+    subtitle_path = None
+    if (subtitle_mode or config.SUBTITLE_MODE) == "ass":
+        subtitle_path = write_ass(local_transcript, f"{output_dir}/scene_{i+1}.ass", resolution)
+        subtitle_filters = [subtitles_filter(subtitle_path)]
+    else:
+        subtitle_filters = build_subtitle_filters(local_transcript)
+    filter_complex = build_filter_complex(resolution, source_info["fps"], subtitle_filters, footage_is_proxy)
+
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-ss", f"{start:.3f}", "-t", f"{duration:.3f}", "-i", source_path,
+        *footage_args, "-i", footage_path,
+        "-filter_complex", filter_complex,
+        "-map", "[v]", "-map", "0:a?",
+        "-t", f"{duration:.3f}",
+        "-c:v", "libx264", "-pix_fmt", "yuv420p",
+        "-c:a", "aac",
+        out_path
+    ]
+    try:
+        subprocess.run(cmd, capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        logging.error(f"ffmpeg failed to render scene {i+1}: {e.stderr}")
+        raise
+    finally:
+        if subtitle_path and os.path.exists(subtitle_path):
+            os.remove(subtitle_path)
+    logging.info(f"Scene {i+1} with subtitles saved to: {out_path}")
+    return out_path
@@ -0,0 +1,205 @@
+import os
+import glob
+import json
+import hashlib
+import logging
+import subprocess
+import numpy as np
+import utils.config as config
+from utils.locking import file_lock
+from utils.processors import probe_video
+from utils.downloaders import download_video_if_needed
+
+def _content_hash(path: str) -> str:
+    """Returns the SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_footage_manifest(manifest_path: str = None) -> dict:
+    """
+    Returns the footage manifest: probed metadata of every downloaded footage, keyed by "game/video".
+
+    Args:
+        manifest_path (str): Path of the manifest. Defaults to config.FOOTAGE_MANIFEST_FILE.
+    """
+    manifest_path = manifest_path or config.FOOTAGE_MANIFEST_FILE
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.error(f"Could not read footage manifest {manifest_path}: {e}")
+        return {}
+
+def _update_footage_manifest(key: str, entry: dict, manifest_path: str = None):
+    """
+    Atomically sets one entry of the footage manifest. Concurrent runs serialize on a lock file,
+    and readers never see a partially written manifest.
+    """
+    manifest_path = manifest_path or config.FOOTAGE_MANIFEST_FILE
+    with file_lock(f"{manifest_path}.lock"):
+        manifest = load_footage_manifest(manifest_path)
+        manifest[key] = entry
+        tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+def _is_current(entry: dict) -> bool:
+    """Whether a manifest entry still describes the file on disk."""
+    path = entry.get("path")
+    if not path or not os.path.isfile(path):
+        return False
+    stat = os.stat(path)
+    return entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns
+
+def _probe_footage(source: str, path: str) -> dict:
+    """Builds the manifest entry of a footage file."""
+    info = probe_video(path)
+    if not info:
+        return None
+    stat = os.stat(path)
+    return {
+        "source": source,
+        "path": os.path.abspath(path),
+        "duration": info["duration"],
+        "width": info["width"],
+        "height": info["height"],
+        "fps": info["fps"],
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": _content_hash(path),
+    }
+
+def get_footage_entry(game: str, video: str, manifest_path: str = None) -> dict:
+    """
+    Returns the manifest entry of a configured footage, downloading and probing it first if needed.
+
+    Args:
+        game (str): The game of the footage, a key of config.brainrot_footage.
+        video (str): The video name of the footage within the game.
+        manifest_path (str): Path of the manifest. Defaults to config.FOOTAGE_MANIFEST_FILE.
+
+    Returns:
+        dict: The entry, with "path", "duration", "width", "height", "fps" and "sha256". None on failure.
+    """
+    manifest_path = manifest_path or config.FOOTAGE_MANIFEST_FILE
+    key = f"{game}/{video}"
+    entry = load_footage_manifest(manifest_path).get(key)
+    if entry and _is_current(entry):
+        return entry
+
+    source, configured_path = config.brainrot_footage[game][video]
+    if not source:
+        logging.error(f"Source for footage '{video}' not found.")
+        return None
+    # One download per footage, even with several runs sharing the library
+    with file_lock(f"{manifest_path}.{game}.{video}.lock"):
+        entry = load_footage_manifest(manifest_path).get(key)
+        if entry and _is_current(entry):
+            return entry
+        footage_path = configured_path if configured_path and os.path.isfile(configured_path) else None
+        if not footage_path:
+            logging.info(f"Footage path for footage '{video}' not found. Downloading from source: {source}")
+            footage_path = download_video_if_needed(source, output_dir=f"footage_{game}")
+        if not footage_path or not os.path.isfile(footage_path):
+            logging.error(f"Could not download footage '{video}' for game '{game}' from source: {source}")
+            return None
+        entry = _probe_footage(source, footage_path)
+        if not entry:
+            logging.error(f"Could not probe footage: {footage_path}")
+            return None
+        _update_footage_manifest(key, entry, manifest_path)
+    logging.info(f"Footage '{key}' recorded in manifest: {entry['path']}")
+    return entry
+
+def select_footage(game: str) -> dict:
+    """
+    Picks a random footage of the specified game.
+
+    Args:
+        game (str): The game to get the footage for.
+
+    Returns:
+        dict: The manifest entry of the footage, see get_footage_entry.
+    """
+    footages = config.brainrot_footage.get(game)
+    if not footages:
+        logging.error(f"No footage found for game '{game}'.")
+        return None
+    vid_list = list(footages.keys())
+    logging.info(f"{len(vid_list)} footages found for game '{game}'")
+    video = np.random.choice(vid_list)
+    return get_footage_entry(game, video)
+
+def _proxy_key(footage_path: str, fps: float, size: tuple) -> str:
+    """
+    Returns a short key identifying a footage file's current content and the proxy settings.
+    Size and modification time stand in for the content, so a replaced source gets a new key.
+    """
+    stat = os.stat(footage_path)
+    fingerprint = f"{os.path.abspath(footage_path)}|{stat.st_size}|{stat.st_mtime_ns}|{size[0]}x{size[1]}|{fps:.3f}"
+    return hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:12]
+
+def get_footage_proxy(footage_path: str, fps: float, size: tuple = (1080, 1080), proxy_dir: str = None) -> str:
+    """
+    Returns a pre-cropped, pre-scaled copy of the footage at the given frame rate, transcoding it on first use.
+    The proxy goes through the same steps as render() (keep the center 65%, scale to the target height,
+    crop the center), so using it only needs a plain decode.
+
+    Args:
+        footage_path (str): Path of the original footage.
+        fps (float): Frame rate of the output video.
+        size (tuple): Size of the footage area of the output video.
+        proxy_dir (str): Directory of the proxies. Defaults to config.FOOTAGE_PROXY_DIR.
+
+    Returns:
+        str: The path of the proxy, or None if it could not be created.
+    """
+    if not footage_path or not os.path.isfile(footage_path):
+        logging.error(f"Footage not found: {footage_path}")
+        return None
+    proxy_dir = proxy_dir or config.FOOTAGE_PROXY_DIR
+    os.makedirs(proxy_dir, exist_ok=True)
+    width, height = size
+    stem = os.path.splitext(os.path.basename(footage_path))[0]
+    path_hash = hashlib.sha1(os.path.abspath(footage_path).encode("utf-8")).hexdigest()[:8]
+    prefix = f"{stem}_{path_hash}_{width}x{height}_{fps:.2f}fps_"
+    proxy_path = os.path.join(proxy_dir, f"{prefix}{_proxy_key(footage_path, fps, size)}.mp4")
+    if os.path.exists(proxy_path):
+        return proxy_path
+
+    # Only one process transcodes a given footage, the others wait and reuse its proxy
+    with file_lock(os.path.join(proxy_dir, f"{prefix}.lock")):
+        if os.path.exists(proxy_path):
+            return proxy_path
+        # Proxies of an older version of the source are stale
+        for stale in glob.glob(os.path.join(glob.escape(proxy_dir), f"{glob.escape(prefix)}*.mp4")):
+            logging.info(f"Removing stale footage proxy: {stale}")
+            os.remove(stale)
+
+        logging.info(f"Creating {width}x{height} footage proxy at {fps:.2f} fps for {footage_path}...")
+        tmp_path = f"{proxy_path}.tmp.mp4"
+        cmd = [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-i", footage_path,
+            "-an",
+            "-vf", f"crop=trunc(iw*0.65/2)*2:ih,scale=-2:{height},crop={width}:{height},setsar=1,fps={fps}",
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "18", "-pix_fmt", "yuv420p",
+            "-g", str(max(1, round(fps))),  # One keyframe per second keeps seeking into the proxy cheap
+            tmp_path
+        ]
+        try:
+            subprocess.run(cmd, capture_output=True, text=True, check=True)
+        except subprocess.CalledProcessError as e:
+            logging.error(f"Failed to create footage proxy for {footage_path}: {e.stderr}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+        os.replace(tmp_path, proxy_path)
+    logging.info(f"Footage proxy saved to: {proxy_path}")
+    return proxy_path
@@ -0,0 +1,325 @@
+import os
+import time
+import socket
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+import utils.config as config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    input TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    owner TEXT,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, id);
+"""
+# Columns added after the first version of the job queue, added to existing queues when opened
+MIGRATIONS = {
+    "owner": "ALTER TABLE jobs ADD COLUMN owner TEXT",
+    "heartbeat_at": "ALTER TABLE jobs ADD COLUMN heartbeat_at REAL",
+}
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".webm", ".avi")
+INBOX_SETTLE_SECONDS = 10  # Inbox files modified more recently than this are left for the next scan
+JOB_LEASE_SECONDS = 90  # A running job whose process has not sent a heartbeat for this long is considered orphaned
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+class JobQueue:
+    """
+    Persistent queue of pipeline inputs (YouTube links or video paths) with the status of each job:
+    queued, running, done, failed or cancelled. Stored in SQLite (WAL mode), so jobs survive restarts and several
+    job threads or processes of the same host can claim from the same queue. A running job records the process
+    that claimed it (owner) and the last heartbeat of that process.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or config.JOBS_FILE
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._local = threading.local()
+        conn = self._connect()
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, statement in MIGRATIONS.items():
+            if columns and column not in columns:
+                conn.execute(statement)
+        conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, input: str, retry_failed: bool = True) -> bool:
+        """
+        Queues an input. An input that already has a job is only queued again if that job failed
+        or was cancelled, and retry_failed is True.
+
+        Returns:
+            bool: True if the input was queued.
+        """
+        conn = self._connect()
+        cursor = conn.execute(
+            """
+            INSERT INTO jobs (input, status, created_at) VALUES (?, 'queued', ?)
+            ON CONFLICT(input) DO UPDATE SET status = 'queued', error = NULL
+            WHERE jobs.status IN ('failed', 'cancelled') AND ?
+            """,
+            (input, _now(), retry_failed),
+        )
+        return cursor.rowcount > 0
+
+    def claim(self) -> dict:
+        """
+        Marks the oldest queued job as running and returns it, or returns None if the queue is empty.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")  # Two workers never claim the same job
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row:
+                conn.execute(
+                    """
+                    UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, finished_at = NULL,
+                        owner = ?, heartbeat_at = ?
+                    WHERE id = ?
+                    """,
+                    (_now(), self.owner, time.time(), row["id"]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return dict(row, status="running", owner=self.owner) if row else None
+
+    def heartbeat(self):
+        """Records that the running jobs of this process are still alive."""
+        self._connect().execute("UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status = 'running'",
+                                (time.time(), self.owner))
+
+    def finish(self, job_id: int, success: bool, error: str = None):
+        """Records the outcome of a running job."""
+        self._connect().execute("UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                                ("done" if success else "failed", error, _now(), job_id))
+
+    def release(self, job_id: int):
+        """Puts a running job back in the queue, e.g. when it was interrupted by a shutdown."""
+        self._connect().execute("UPDATE jobs SET status = 'queued' WHERE id = ? AND status = 'running'", (job_id,))
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        Cancels a queued job. A running job is cancelled by its worker (JobWorkers.cancel), and keeps
+        the running status until it has stopped, so its input cannot be queued again meanwhile.
+
+        Returns:
+            bool: True if the job was queued.
+        """
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+            (_now(), job_id))
+        return cursor.rowcount > 0
+
+    def finish_cancelled(self, job_id: int):
+        """Records that a running job stopped after being cancelled."""
+        self._connect().execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'running'",
+            (_now(), job_id))
+
+    def get(self, job_id: int) -> dict:
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def find(self, input: str) -> dict:
+        """Returns the job of an input, or None."""
+        row = self._connect().execute("SELECT * FROM jobs WHERE input = ?", (input,)).fetchone()
+        return dict(row) if row else None
+
+    def list(self, status: str = None) -> list[dict]:
+        """Returns the jobs, optionally only those with the given status, oldest first."""
+        query, params = "SELECT * FROM jobs", ()
+        if status:
+            query, params = query + " WHERE status = ?", (status,)
+        return [dict(row) for row in self._connect().execute(query + " ORDER BY id", params)]
+
+    def _owner_gone(self, job: dict) -> bool:
+        """
+        A running job is orphaned if its process stopped sending heartbeats, or if that process ran
+        on this host and no longer exists.
+        """
+        if job["heartbeat_at"] is None or time.time() - job["heartbeat_at"] > JOB_LEASE_SECONDS:
+            return True
+        host, _, pid = (job["owner"] or "").rpartition(":")
+        if host != socket.gethostname() or not pid.isdigit() or os.name == "nt":
+            return False
+        try:
+            os.kill(int(pid), 0)  # Signal 0 only checks that the process exists
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
+        return False
+
+    def requeue_interrupted(self) -> int:
+        """
+        Queues again the jobs left running by a process that stopped. Jobs of processes still running
+        (another batch or daemon on the same queue) are left alone. Call it before starting the job workers.
+
+        Returns:
+            int: The number of requeued jobs.
+        """
+        conn = self._connect()
+        requeued = 0
+        for job in self.list("running"):
+            if job["owner"] == self.owner or not self._owner_gone(job):
+                continue
+            cursor = conn.execute("UPDATE jobs SET status = 'queued' WHERE id = ? AND status = 'running' AND owner IS ?",
+                                  (job["id"], job["owner"]))
+            requeued += cursor.rowcount
+        if requeued:
+            logging.info(f"Requeued {requeued} interrupted jobs.")
+        return requeued
+
+class JobWorkers:
+    """
+    Threads that claim jobs from a JobQueue and run them with `run(input, cancel_event) -> bool`.
+    Threads of one process share whatever `run` keeps loaded (models, YouTube service, footage).
+
+    Args:
+        queue (JobQueue): The job queue.
+        run (callable): Runs one job, returns True on success. It should stop early once cancel_event is set.
+        jobs (int): Number of jobs run at the same time.
+        keep_running (bool): If False, the workers stop once the queue is empty; if True, they wait for new jobs.
+        poll_seconds (float): How often idle workers check the queue when keep_running is True.
+    """
+
+    def __init__(self, queue: JobQueue, run, jobs: int = 1, keep_running: bool = False, poll_seconds: float = 5.0):
+        self.queue = queue
+        self.run = run
+        self.keep_running = keep_running
+        self.poll_seconds = poll_seconds
+        self.stop_event = threading.Event()
+        self.failures = []
+        self._running = {}  # Job ID -> cancel event of the job
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._work, name=f"job-{n}", daemon=True) for n in range(jobs)]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True).start()
+
+    def _heartbeat(self):
+        # Tells other processes sharing the queue that the running jobs of this one are not orphaned
+        while self.is_alive():
+            try:
+                self.queue.heartbeat()
+            except sqlite3.Error as e:
+                logging.warning(f"Could not record the job heartbeat: {e}")
+            time.sleep(JOB_LEASE_SECONDS / 3)
+
+    def is_alive(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def stop(self):
+        """Stops every job after its current scene or stage. Interrupted jobs go back to the queue."""
+        self.stop_event.set()
+        with self._lock:
+            for cancel_event in self._running.values():
+                cancel_event.set()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        Cancels a job: a queued one is never started, a running one stops after its current scene or stage
+        and is marked as cancelled once it has stopped.
+
+        Returns:
+            bool: True if the job was queued or running.
+        """
+        with self._lock:
+            cancel_event = self._running.get(job_id)
+            if cancel_event:
+                cancel_event.set()
+        return self.queue.cancel(job_id) or cancel_event is not None
+
+    def _work(self):
+        while not self.stop_event.is_set():
+            job = self.queue.claim()
+            if job is None:
+                if not self.keep_running:
+                    return
+                self.stop_event.wait(self.poll_seconds)
+                continue
+            cancel_event = threading.Event()
+            with self._lock:
+                self._running[job["id"]] = cancel_event
+            logging.info(f"Starting job {job['id']}: {job['input']}")
+            try:
+                success, error = self.run(job["input"], cancel_event), None
+            except Exception as e:
+                success, error = False, str(e)
+                logging.error(f"Job {job['id']} failed: {e}")
+            finally:
+                with self._lock:
+                    self._running.pop(job["id"], None)
+            if not success and self.stop_event.is_set():
+                self.queue.release(job["id"])  # Interrupted by a shutdown, not failed: run it again next time
+                continue
+            if not success and cancel_event.is_set():
+                self.queue.finish_cancelled(job["id"])
+                logging.info(f"Job {job['id']} cancelled: {job['input']}")
+                continue
+            self.queue.finish(job["id"], success, error)
+            if not success:
+                self.failures.append(job["id"])
+            logging.info(f"Job {job['id']} {'done' if success else 'failed'}: {job['input']}")
+
+def read_inputs(sources: list[str]) -> list[str]:
+    """
+    Expands the batch arguments into inputs: a text file contributes one input per line
+    (blank lines and lines starting with # are ignored), anything else is an input itself.
+    """
+    inputs = []
+    for source in sources:
+        if os.path.isfile(source) and source.endswith(".txt"):
+            with open(source, "r") as f:
+                inputs.extend(line.strip() for line in f if line.strip() and not line.lstrip().startswith("#"))
+        else:
+            inputs.append(source)
+    return inputs
+
+def scan_inbox(inbox: str, queue: JobQueue) -> int:
+    """
+    Queues the video files of the inbox directory that have no job yet.
+    Files that failed are not retried on every scan, queue them again with JobQueue.add.
+
+    Returns:
+        int: The number of newly queued files.
+    """
+    queued = 0
+    for name in sorted(os.listdir(inbox)):
+        path = os.path.abspath(os.path.join(inbox, name))
+        if not name.lower().endswith(VIDEO_EXTENSIONS) or not os.path.isfile(path):
+            continue
+        if time.time() - os.path.getmtime(path) < INBOX_SETTLE_SECONDS:
+            continue  # Probably still being copied in
+        if queue.add(path, retry_failed=False):
+            logging.info(f"Queued {path} from the inbox.")
+            queued += 1
+    return queued
@@ -0,0 +1,56 @@
+import os
+import time
+import logging
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+@contextmanager
+def file_lock(path: str, timeout: float = None):
+    """
+    Holds an exclusive lock on `path` (created if missing) for the duration of the block.
+    Works across processes of the same host.
+
+    Args:
+        path (str): Path of the lock file.
+        timeout (float): Seconds to wait for the lock before raising TimeoutError. Waits forever if None.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    if fcntl is None:
+        # Fallback: the lock is the existence of the file itself
+        while True:
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError(f"Could not acquire lock {path}")
+                time.sleep(0.1)
+        try:
+            yield
+        finally:
+            os.close(fd)
+            os.remove(path)
+        return
+
+    with open(path, "a") as lock_file:
+        waiting = False
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError(f"Could not acquire lock {path}")
+                if not waiting:
+                    logging.debug(f"Waiting for lock {path}...")
+                    waiting = True
+                time.sleep(0.1)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
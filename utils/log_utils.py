@@ -1,27 +1,211 @@
 import os
-from utils.config import UPLOAD_LOG_FILE, FAILED_UPLOAD_LOG_FILE
-def log_uploaded_video(video_path):
+import sys
+import sqlite3
+import logging
+import argparse
+import threading
+from datetime import datetime
+from utils.config import UPLOAD_LOG_FILE, FAILED_UPLOAD_LOG_FILE, LEDGER_FILE
+from utils.checkpoint import quick_file_hash
+from utils.locking import file_lock
+
+# Upload ledger: one row per short, keyed by a hash of its content, so a file is recognized
+# even if it was moved or renamed. SQLite in WAL mode lets concurrent workers read while one writes.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    content_hash TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    video_id TEXT,
+    error TEXT,
+    target TEXT,
+    part INTEGER,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS uploads_path ON uploads(path);
+CREATE INDEX IF NOT EXISTS uploads_status ON uploads(status);
+CREATE TABLE IF NOT EXISTS quota_usage (
+    project TEXT NOT NULL,
+    day TEXT NOT NULL,
+    units INTEGER NOT NULL DEFAULT 0,
+    exhausted INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (project, day)
+);
+"""
+# Columns added after the first version of the ledger, added to existing ledgers when opened
+MIGRATIONS = {
+    "target": "ALTER TABLE uploads ADD COLUMN target TEXT",
+    "part": "ALTER TABLE uploads ADD COLUMN part INTEGER",
+}
+
+_local = threading.local()
+_import_lock = threading.Lock()
+_legacy_imported = False
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Returns this thread's connection to the ledger database, creating the ledger and importing
+    the legacy logs on first use.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(LEDGER_FILE), exist_ok=True)
+        conn = sqlite3.connect(LEDGER_FILE, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(uploads)")}
+        for column, statement in MIGRATIONS.items():
+            if columns and column not in columns:
+                conn.execute(statement)
+        conn.executescript(SCHEMA)
+        _local.conn = conn
+        _import_legacy_once(conn)
+    return conn
+
+def _import_legacy_once(conn: sqlite3.Connection):
+    """Imports the legacy logs on the first connection of the process, not on every thread's."""
+    global _legacy_imported
+    with _import_lock:
+        if not _legacy_imported:
+            import_legacy_logs(conn)
+            _legacy_imported = True
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+def _key(video_path: str) -> str:
+    """Content hash of the file, or its path if the file no longer exists (e.g. deleted after upload)."""
+    if os.path.isfile(video_path):
+        return quick_file_hash(video_path)
+    return f"path:{os.path.abspath(video_path)}"
+
+def _record(video_path: str, status: str, video_id: str = None, error: str = None, conn: sqlite3.Connection = None):
+    conn = conn or get_connection()
+    now = _now()
+    with conn:
+        conn.execute(
+            """
+            INSERT INTO uploads (content_hash, path, status, attempts, video_id, error, created_at, updated_at)
+            VALUES (?, ?, ?, 1, ?, ?, ?, ?)
+            ON CONFLICT(content_hash) DO UPDATE SET
+                path = excluded.path,
+                status = CASE WHEN uploads.status = 'uploaded' THEN uploads.status ELSE excluded.status END,
+                attempts = uploads.attempts + 1,
+                video_id = COALESCE(excluded.video_id, uploads.video_id),
+                error = excluded.error,
+                updated_at = excluded.updated_at
+            """,
+            (_key(video_path), os.path.abspath(video_path), status, video_id, error, now, now),
+        )
+
+def log_uploaded_video(video_path: str, video_id: str = None):
     """Log a successfully uploaded video."""
-    os.makedirs(os.path.dirname(UPLOAD_LOG_FILE), exist_ok=True)
-    with open(UPLOAD_LOG_FILE, "a") as f:
-        f.write(f"{video_path}\n")
-
-def log_failed_upload(video_path):
-    """Log a failed upload for retrying later."""
-    os.makedirs(os.path.dirname(FAILED_UPLOAD_LOG_FILE), exist_ok=True)
-    with open(FAILED_UPLOAD_LOG_FILE, "a") as f:
-        f.write(f"{video_path}\n")
-
-def get_uploaded_videos():
-    """Retrieve the list of already uploaded videos from the log file."""
-    if not os.path.exists(UPLOAD_LOG_FILE):
-        return set()
-    with open(UPLOAD_LOG_FILE, "r") as f:
-        return set(line.strip() for line in f)
-
-def get_failed_videos():
-    """Retrieve the list of failed uploads."""
-    if not os.path.exists(FAILED_UPLOAD_LOG_FILE):
-        return set()
-    with open(FAILED_UPLOAD_LOG_FILE, "r") as f:
-        return set(line.strip() for line in f)
\ No newline at end of file
+    _record(video_path, "uploaded", video_id=video_id)
+
+def log_failed_upload(video_path: str, error: str = None):
+    """Log a failed upload for retrying later. A video already uploaded stays uploaded."""
+    _record(video_path, "failed", error=error)
+
+def log_queued_upload(video_path: str, target: str, part: int):
+    """
+    Queue a video for upload in a later quota window. The target directory and the part number
+    are kept to title the video when the queue is drained. A video already uploaded stays uploaded.
+    """
+    conn = get_connection()
+    now = _now()
+    with conn:
+        conn.execute(
+            """
+            INSERT INTO uploads (content_hash, path, status, attempts, target, part, created_at, updated_at)
+            VALUES (?, ?, 'queued', 0, ?, ?, ?, ?)
+            ON CONFLICT(content_hash) DO UPDATE SET
+                path = excluded.path,
+                status = CASE WHEN uploads.status = 'uploaded' THEN uploads.status ELSE 'queued' END,
+                target = excluded.target,
+                part = excluded.part,
+                updated_at = excluded.updated_at
+            """,
+            (_key(video_path), os.path.abspath(video_path), os.path.abspath(target), part, now, now),
+        )
+
+def set_status(content_hash: str, status: str, error: str = None):
+    """Sets the status of an existing ledger entry, e.g. one whose file is gone and can no longer be hashed."""
+    conn = get_connection()
+    with conn:
+        conn.execute("UPDATE uploads SET status = ?, error = ?, updated_at = ? WHERE content_hash = ?",
+                     (status, error, _now(), content_hash))
+
+def get_queued_uploads() -> list[dict]:
+    """Returns the queued uploads, oldest first."""
+    rows = get_connection().execute("SELECT * FROM uploads WHERE status = 'queued' ORDER BY created_at, part").fetchall()
+    return [dict(row) for row in rows]
+
+def get_upload(video_path: str) -> dict:
+    """
+    Returns the ledger entry of a video (status, attempts, video_id, timestamps), or None.
+    Looked up by content hash, then by path.
+    """
+    conn = get_connection()
+    row = conn.execute("SELECT * FROM uploads WHERE content_hash = ?", (_key(video_path),)).fetchone()
+    if row is None:
+        row = conn.execute("SELECT * FROM uploads WHERE path = ? ORDER BY updated_at DESC LIMIT 1",
+                           (os.path.abspath(video_path),)).fetchone()
+    return dict(row) if row else None
+
+def is_uploaded(video_path: str) -> bool:
+    """Returns True if the ledger records the video as uploaded."""
+    entry = get_upload(video_path)
+    return bool(entry) and entry["status"] == "uploaded"
+
+def import_legacy_logs(conn: sqlite3.Connection = None) -> int:
+    """
+    Imports the entries of the old uploaded_videos.log / failed_uploads.log text logs into the ledger,
+    then renames the logs to *.imported. Uploaded entries are imported last, so they win over failures.
+    Runs under a file lock, so concurrent processes do not import (and rename) the same log twice.
+
+    Returns:
+        int: The number of imported entries.
+    """
+    conn = conn or get_connection()
+    imported = 0
+    with file_lock(f"{LEDGER_FILE}.import.lock"):
+        for log_file, status in ((FAILED_UPLOAD_LOG_FILE, "failed"), (UPLOAD_LOG_FILE, "uploaded")):
+            try:
+                with open(log_file, "r") as f:
+                    paths = [line.strip() for line in f if line.strip()]
+            except FileNotFoundError:
+                continue  # No legacy log, or already imported and renamed
+            for path in paths:
+                _record(path, status, conn=conn)
+            os.replace(log_file, f"{log_file}.imported")
+            logging.info(f"Imported {len(paths)} entries of {log_file} into the upload ledger.")
+            imported += len(paths)
+    return imported
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.log_utils", description="Inspect the upload ledger.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("import", help="Import the legacy text upload logs")
+    list_parser = commands.add_parser("list", help="List the ledger entries, most recent first")
+    list_parser.add_argument("--status", default=None, help="Only list entries with this status")
+    args = parser.parse_args(argv)
+
+    conn = get_connection()
+    if args.command == "import":
+        print(f"Imported {import_legacy_logs(conn)} entries.")
+    elif args.command == "list":
+        query, params = "SELECT * FROM uploads", ()
+        if args.status:
+            query, params = query + " WHERE status = ?", (args.status,)
+        rows = conn.execute(query + " ORDER BY updated_at DESC", params).fetchall()
+        for row in rows:
+            print(f"{row['updated_at']}  {row['status']:<9} {row['attempts']:>3}  {row['video_id'] or '-':<11}  {row['path']}")
+        print(f"{len(rows)} entries")
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
+    sys.exit(main())
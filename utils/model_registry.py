@@ -0,0 +1,72 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+import utils.config as config
+
+# (backend, model name) -> (model, estimated size in bytes), least recently used first
+_models = OrderedDict()
+_lock = threading.Lock()
+
+def _load(backend: str, model_name: str):
+    if backend == "whisper":
+        import whisper
+        return whisper.load_model(model_name)
+    if backend == "vosk":
+        import vosk
+        return vosk.Model(os.path.join(config.VOSK_DIRECTORY, model_name))
+    raise ValueError(f"Unknown model backend '{backend}'")
+
+def _estimate_size(backend: str, model_name: str, model) -> int:
+    """Estimates the memory held by a loaded model."""
+    if backend == "whisper":
+        return sum(p.numel() * p.element_size() for p in model.parameters())
+    # Vosk models are mapped from their directory, its size on disk is a good estimate
+    total = 0
+    for root, _, files in os.walk(os.path.join(config.VOSK_DIRECTORY, model_name)):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+def get_model(backend: str, model_name: str):
+    """
+    Returns the loaded model, loading it only the first time it is requested in this process.
+    Models stay resident across videos; when the total exceeds config.MODEL_MEMORY_BUDGET_MB,
+    the least recently used models are unloaded.
+
+    Args:
+        backend (str): "whisper" or "vosk".
+        model_name (str): Name of the model.
+
+    Returns:
+        The Whisper or Vosk model.
+    """
+    key = (backend, model_name)
+    with _lock:
+        if key in _models:
+            _models.move_to_end(key)
+            logging.info(f"Using loaded {backend} model: {model_name}")
+            return _models[key][0]
+
+        logging.info(f"Loading {backend} model: {model_name}")
+        start = time.perf_counter()
+        model = _load(backend, model_name)
+        size = _estimate_size(backend, model_name, model)
+        logging.info(f"{backend} model {model_name} loaded in {time.perf_counter() - start:.1f}s (~{size / 1024 / 1024:.0f} MB)")
+
+        budget = config.MODEL_MEMORY_BUDGET_MB * 1024 * 1024
+        while _models and sum(entry[1] for entry in _models.values()) + size > budget:
+            (old_backend, old_name), _ = _models.popitem(last=False)
+            logging.info(f"Unloading {old_backend} model {old_name} to stay within the model memory budget.")
+        _models[key] = (model, size)
+        return model
+
+def unload_models():
+    """Unloads every model held by the registry."""
+    with _lock:
+        _models.clear()
+
+def loaded_models() -> list[tuple]:
+    """Returns the (backend, model name) of the loaded models, least recently used first."""
+    with _lock:
+        return list(_models.keys())
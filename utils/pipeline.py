@@ -0,0 +1,111 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+class Stage:
+    """
+    A pipeline stage: a function of the results of the stages it depends on.
+
+    Args:
+        name (str): Name of the stage, also the key of its result.
+        func (callable): Called with the dict of results of the finished stages, returns the stage's result.
+        deps (tuple): Names of the stages that must finish first.
+        required (bool): If True, a falsy result fails the pipeline. Optional stages (e.g. a lookup
+            that may find nothing) only fail it by raising.
+        run_if_cancelled (bool): If True, the stage still runs after a cancel once its dependencies have
+            finished, e.g. to upload the shorts rendered before the cancel.
+    """
+
+    def __init__(self, name: str, func, deps: tuple = (), required: bool = True, run_if_cancelled: bool = False):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.required = required
+        self.run_if_cancelled = run_if_cancelled
+
+def run_stages(stages: list[Stage], max_workers: int = None, cancel_event: threading.Event = None) -> dict:
+    """
+    Runs the stages as soon as their dependencies have finished, independent stages at the same time.
+    Stages run in threads: the heavy ones wait on ffmpeg, native code or the network, not on the GIL.
+    Once a stage fails or `cancel_event` is set, no further stage is started (except run_if_cancelled ones);
+    running stages are waited for, since threads cannot be interrupted. Ctrl-C sets `cancel_event`, which
+    long stages (rendering) check to stop early.
+
+    Args:
+        stages (list[Stage]): The stages, with dependencies among themselves only.
+        max_workers (int): Number of stages run at the same time, 1 runs them one after the other.
+        cancel_event (threading.Event): Set it from another thread to stop the pipeline.
+
+    Returns:
+        dict: The result of each stage by name, or None if a stage failed or the pipeline was cancelled.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        for dep in stage.deps:
+            if dep not in by_name:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+
+    cancel_event = cancel_event or threading.Event()
+    results, timings = {}, {}
+    pending = list(stages)
+    running = {}
+    failed = False
+    pipeline_start = time.perf_counter()
+
+    def run(stage: Stage, inputs: dict):
+        start = time.perf_counter()
+        try:
+            return stage.func(inputs)
+        finally:
+            timings[stage.name] = time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages), thread_name_prefix="stage") as executor:
+        while pending or running:
+            if not failed:
+                cancelled = cancel_event.is_set()
+                for stage in [stage for stage in pending if all(dep in results for dep in stage.deps)]:
+                    if cancelled and not stage.run_if_cancelled:
+                        continue
+                    pending.remove(stage)
+                    logging.info(f"Starting stage '{stage.name}'")
+                    running[executor.submit(run, stage, dict(results))] = stage
+            if not running:
+                if pending and not failed and not cancel_event.is_set():
+                    raise ValueError(f"Stages {[stage.name for stage in pending]} have circular dependencies")
+                break
+
+            try:
+                done, _ = wait(running, timeout=1.0, return_when=FIRST_COMPLETED)
+            except KeyboardInterrupt:
+                # Raised in this thread only: hand it to the stage threads, which stop at their next check
+                logging.warning("Process interrupted, stopping after the running stages.")
+                cancel_event.set()
+                continue
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logging.error(f"Stage '{stage.name}' failed after {timings[stage.name]:.1f}s: {e}")
+                    failed = True
+                    continue
+                if stage.required and not result:
+                    logging.error(f"Stage '{stage.name}' produced no result after {timings[stage.name]:.1f}s.")
+                    failed = True
+                    continue
+                results[stage.name] = result
+                logging.info(f"Stage '{stage.name}' finished in {timings[stage.name]:.1f}s")
+
+    elapsed = time.perf_counter() - pipeline_start
+    summary = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in timings.items())
+    logging.info(f"Pipeline ran for {elapsed:.1f}s, {sum(timings.values()):.1f}s of stage time ({summary})")
+    if failed:
+        return None
+    if cancel_event.is_set():
+        if pending:
+            logging.warning(f"Pipeline cancelled before stages {[stage.name for stage in pending]}.")
+        else:
+            logging.warning("Pipeline cancelled.")
+        return None
+    return results
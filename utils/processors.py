@@ -1,13 +1,153 @@
 import re
+import os
+import json
+import threading
+from collections import deque
 import subprocess
 import logging
 import sys
+from concurrent.futures import ThreadPoolExecutor
+import utils.config as config
+
+def _run_ffmpeg_streaming(cmd: list[str], on_stdout_line, on_stderr_line=None) -> tuple[int, str]:
+    """
+    Runs an ffmpeg command and hands its output to the callbacks line by line as it is produced,
+    instead of buffering everything until the process exits.
+    Args:
+        cmd (List[str]): The command.
+        on_stdout_line: Called with each stdout line.
+        on_stderr_line: Called with each stderr line, read in a background thread.
+    Returns:
+        tuple: The return code and the last lines of stderr, for error reporting.
+    """
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1)
+    stderr_tail = deque(maxlen=50)
+
+    def read_stderr():
+        for line in process.stderr:
+            stderr_tail.append(line)
+            if on_stderr_line:
+                on_stderr_line(line)
+
+    # stderr is drained concurrently, otherwise ffmpeg could block on a full pipe
+    stderr_reader = threading.Thread(target=read_stderr, daemon=True)
+    stderr_reader.start()
+    for line in process.stdout:
+        on_stdout_line(line)
+    process.wait()
+    stderr_reader.join()
+    return process.returncode, "".join(stderr_tail)
+
+def _scene_filters(threshold: float, scale_width: int = None, analysis_fps: float = None, keyframes_only: bool = False) -> str:
+    """Builds the video filter printing the pts_time of every frame above the scene threshold."""
+    filters = []
+    if analysis_fps and not keyframes_only:
+        filters.append(f"fps={analysis_fps}")
+    if scale_width:
+        filters.append(f"scale={scale_width}:-2:flags=fast_bilinear")
+    filters.append(f"select='gt(scene,{threshold})'")
+    filters.append("metadata=print:file=-")
+    return ",".join(filters)
+
+def _parse_pts_time(line: str) -> float:
+    """Returns the pts_time printed by the metadata filter on this line, or None."""
+    if "pts_time:" in line:
+        match = re.search(r"pts_time:([\d\.]+)", line)
+        if match:
+            return float(match.group(1))
+    return None
+
+def _scan_scene_cuts(
+    input_video: str,
+    threshold: float,
+    start_sec: float = None,
+    duration: float = None,
+    scale_width: int = None,
+    analysis_fps: float = None,
+    keyframes_only: bool = False
+) -> list[float]:
+    """
+    Run ffmpeg's scene filter over (a range of) a video and return the timestamps of the cuts.
+    Args:
+        input_video (str): Path to the input video file.
+        threshold (float): The threshold for scene change detection.
+        start_sec (float): Start of the range in seconds, reached with input-side seeking.
+        duration (float): Length of the range in seconds.
+        scale_width (int): Analyze frames downscaled to this width.
+        analysis_fps (float): Analyze only this many frames per second.
+        keyframes_only (bool): Decode and analyze keyframes only.
+    Returns:
+        List[float]: Timestamps of the cuts in the full video's time, unsorted.
+    """
+    cmd = ["ffmpeg", "-hide_banner", "-nostats"]
+    if keyframes_only:
+        cmd += ["-skip_frame", "nokey"]
+    if start_sec:
+        cmd += ["-ss", f"{start_sec:.3f}"]
+    if duration is not None:
+        cmd += ["-t", f"{duration:.3f}"]
+    cmd += ["-i", input_video, "-map", "0:v:0"]
+    cmd += ["-vf", _scene_filters(threshold, scale_width, analysis_fps, keyframes_only), "-f", "null", "-"]
+
+    # With input-side seeking the timestamps restart at 0, shift them back to the full video's time
+    offset = start_sec or 0.0
+    timestamps = []
+
+    def on_line(line: str):
+        pts_time = _parse_pts_time(line)
+        if pts_time is not None:
+            timestamps.append(pts_time + offset)
+
+    returncode, stderr = _run_ffmpeg_streaming(cmd, on_line)
+    if returncode != 0:
+        logging.error(f"Error in detect_scenes: {stderr}")
+        return None
+    return timestamps
+
+def refine_scene_cuts(input_video: str, cuts: list[float], threshold: float, window: float) -> list[float]:
+    """
+    Re-checks the neighbourhood of each cut found by a coarse analysis at full frame rate and
+    resolution, and moves the cut to the precise frame. Cuts that are not confirmed are kept as they are.
+    Args:
+        input_video (str): Path to the input video file.
+        cuts (List[float]): Timestamps of the coarse cuts.
+        threshold (float): The threshold for scene change detection.
+        window (float): Seconds checked on each side of a cut.
+    Returns:
+        List[float]: The refined timestamps.
+    """
+    refined = []
+    for cut in cuts:
+        start = max(0.0, cut - window)
+        candidates = _scan_scene_cuts(input_video, threshold, start_sec=start, duration=2 * window)
+        if candidates:
+            cut = min(candidates, key=lambda candidate: abs(candidate - cut))
+        refined.append(cut)
+    return refined
+
+def _detect_cuts(input_video: str, threshold: float, start_sec: float = None,
+                 duration: float = None, mode: str = "full") -> list[float]:
+    """
+    Returns the raw scene cuts of (a range of) a video with the given detection mode, or None on failure.
+    """
+    if mode == "fast":
+        timestamps = _scan_scene_cuts(input_video, threshold, start_sec=start_sec, duration=duration,
+                                      scale_width=config.SCENE_ANALYSIS_WIDTH,
+                                      analysis_fps=config.SCENE_ANALYSIS_FPS,
+                                      keyframes_only=config.SCENE_KEYFRAMES_ONLY)
+        if timestamps and config.SCENE_REFINE_WINDOW:
+            logging.info(f"Refining {len(timestamps)} scene cuts at full frame rate...")
+            timestamps = refine_scene_cuts(input_video, timestamps, threshold, config.SCENE_REFINE_WINDOW)
+        return timestamps
+    return _scan_scene_cuts(input_video, threshold, start_sec=start_sec, duration=duration)
 
 def detect_scenes(
     input_video: str,
     threshold: float = 0.8,
     start_sec: float = None,
-    end_sec: float = None
+    end_sec: float = None,
+    mode: str = None,
+    shards: int = None
 ) -> list[float]:
     """
     Run ffmpeg scene detection on a given video and return the sorted list of
@@ -17,45 +157,96 @@ def detect_scenes(
         threshold (float): The threshold for scene change detection. The higher the value, the less sensitive the detection.
         start_sec (float): Start time in seconds for scene detection.
         end_sec (float): End time in seconds for scene detection.
+        mode (str): "full" analyzes every frame at full resolution. "fast" analyzes a downscaled, frame-decimated
+            (or keyframe-only) stream, optionally refining the cuts at full rate. Defaults to config.SCENE_DETECTION_MODE.
+        shards (int): Number of time ranges analyzed concurrently when detecting over the whole video.
+            Defaults to config.SCENE_DETECTION_SHARDS.
     Returns:
         List[float]: A sorted list of timestamps where scene changes occur.
     """
-
-    # Build ffmpeg filter expression
+    if mode is None:
+        mode = config.SCENE_DETECTION_MODE
+    if shards is None:
+        shards = config.SCENE_DETECTION_SHARDS
+    duration = None
     if start_sec is not None and end_sec is not None:
-        scene_filter = (
-            f"[0:v]select='between(t,{start_sec},{end_sec})',"
-            f"select='gt(scene,{threshold})',metadata=print:file=-"
-        )
-    else:
-        scene_filter = f"select='gt(scene,{threshold})',metadata=print:file=-"
+        duration = end_sec - start_sec
+    elif shards > 1:
+        return detect_scenes_sharded(input_video, threshold=threshold, shards=shards, mode=mode)
 
-    cmd = [
-        "ffmpeg", "-hide_banner", "-i", input_video,
-        "-filter_complex", scene_filter,
-        "-f", "null", "-"
-    ]
+    logging.info(f"Running ffmpeg scene detection ({mode}) for {input_video}...")
+    timestamps = _detect_cuts(input_video, threshold, start_sec=start_sec, duration=duration, mode=mode)
+    if timestamps is None:
+        return []
+    logging.info("Scene detection complete. Parsing timestamps...")
+    return finalize_scene_timestamps(timestamps, get_video_duration(input_video))
 
-    logging.info(f"Running ffmpeg scene detection for {input_video}...")
+def detect_scenes_sharded(
+    input_video: str,
+    threshold: float = 0.8,
+    shards: int = 4,
+    overlap: float = None,
+    mode: str = None
+) -> list[float]:
+    """
+    Run scene detection on N overlapping time ranges of a video concurrently, each ffmpeg process
+    seeking to its own range, and merge the cuts found twice in the overlaps.
+    Args:
+        input_video (str): Path to the input video file.
+        threshold (float): The threshold for scene change detection.
+        shards (int): Number of time ranges.
+        overlap (float): Seconds each range extends into its neighbours. Defaults to config.SCENE_SHARD_OVERLAP.
+        mode (str): Detection mode of each range, see detect_scenes.
+    Returns:
+        List[float]: A sorted list of timestamps where scene changes occur.
+    """
+    if mode is None:
+        mode = config.SCENE_DETECTION_MODE
+    if overlap is None:
+        overlap = config.SCENE_SHARD_OVERLAP
+    duration = get_video_duration(input_video)
+    if not duration:
+        logging.error(f"Could not get the duration of {input_video}. Cannot shard scene detection.")
+        return []
+    shard_length = duration / shards
+    ranges = []
+    for k in range(shards):
+        start = max(0.0, k * shard_length - overlap)
+        end = min(duration, (k + 1) * shard_length + overlap)
+        ranges.append((start, end - start))
 
-    try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Error in detect_scenes: {e.stderr}", file=sys.stderr)
+    logging.info(f"Running ffmpeg scene detection ({mode}) for {input_video} in {shards} shards...")
+    with ThreadPoolExecutor(max_workers=shards) as executor:
+        results = list(executor.map(lambda r: _detect_cuts(input_video, threshold, start_sec=r[0], duration=r[1], mode=mode), ranges))
+    if any(result is None for result in results):
+        logging.error("Scene detection failed for at least one shard.")
         return []
-    logging.info("Scene detection complete. Parsing timestamps...")
-    # Parse output for lines containing "pts_time:"
+
+    # A cut inside an overlap is found by both neighbouring shards, possibly a frame apart
+    tolerance = 0.25
+    if mode == "fast" and not config.SCENE_REFINE_WINDOW and config.SCENE_ANALYSIS_FPS:
+        tolerance = max(tolerance, 1.0 / config.SCENE_ANALYSIS_FPS)
     timestamps = []
-    for line in (result.stdout + result.stderr).splitlines():
-        if "pts_time:" in line:
-            match = re.search(r"pts_time:([\d\.]+)", line)
-            if match:
-                timestamps.append(float(match.group(1)))
+    for cut in sorted(cut for result in results for cut in result):
+        if not timestamps or cut - timestamps[-1] > tolerance:
+            timestamps.append(cut)
+    logging.info(f"Scene detection complete. {len(timestamps)} cuts found across {shards} shards.")
+    return finalize_scene_timestamps(timestamps, duration)
+
+def finalize_scene_timestamps(timestamps: list[float], duration: float) -> list[float]:
+    """
+    Turns raw scene cuts into scene boundaries from 0 to the end of the video,
+    merging short scenes and splitting long ones.
+    Args:
+        timestamps (List[float]): Timestamps of the detected cuts.
+        duration (float): Duration of the video in seconds.
+    Returns:
+        List[float]: A sorted list of scene boundaries.
+    """
     timestamps = sorted(timestamps)
 
     if timestamps and timestamps[0] > 0.0:
         timestamps.insert(0, 0.0)
-    duration = get_video_duration(input_video)
 
     if not timestamps or abs(timestamps[-1] - duration) > 0.01:
         timestamps.append(duration)
@@ -157,4 +348,246 @@ def get_video_duration(input_file: str) -> float:
         return float(result.stdout.strip())
     except (subprocess.CalledProcessError, ValueError) as e:
         print(f"Error in get_video_duration: {e}", file=sys.stderr)
-        return 0.0
\ No newline at end of file
+        return 0.0
+
+def probe_video(input_file: str) -> dict:
+    """
+    Use ffprobe to get the duration, resolution and frame rate of the first video stream.
+
+    Args:
+        input_file (str): Path to the video file.
+
+    Returns:
+        dict: {"duration", "width", "height", "fps"}, or None if the file could not be probed.
+    """
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=width,height,avg_frame_rate:format=duration",
+        "-of", "json",
+        input_file
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        info = json.loads(result.stdout)
+        stream = info["streams"][0]
+        num, _, den = stream.get("avg_frame_rate", "0/1").partition("/")
+        fps = float(num) / float(den) if den and float(den) else float(num)
+        return {
+            "duration": float(info["format"]["duration"]),
+            "width": int(stream["width"]),
+            "height": int(stream["height"]),
+            "fps": fps,
+        }
+    except (subprocess.CalledProcessError, ValueError, KeyError, IndexError) as e:
+        logging.error(f"Error in probe_video for {input_file}: {e}")
+        return None
+
+def keyframe_before(input_file: str, time: float, window: float = 10.0) -> float:
+    """
+    Use ffprobe to find the last video keyframe at or before `time`. Only packet headers around `time`
+    are read, nothing is decoded, so it is cheap even deep into a multi-GB file.
+
+    Args:
+        input_file (str): Path to the video file.
+        time (float): Time in seconds.
+        window (float): Seconds read before `time`, doubled until a keyframe is found.
+
+    Returns:
+        float: The keyframe time, or None if the file could not be probed.
+    """
+    while True:
+        read_start = max(0.0, time - window)
+        cmd = [
+            "ffprobe",
+            "-v", "error",
+            "-select_streams", "v:0",
+            "-read_intervals", f"{read_start:.3f}%{time + 0.1:.3f}",
+            "-show_entries", "packet=pts_time,flags",
+            "-of", "csv=p=0",
+            input_file
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        except subprocess.CalledProcessError as e:
+            logging.error(f"Error in keyframe_before for {input_file}: {e.stderr}")
+            return None
+        keyframes = []
+        for line in result.stdout.splitlines():
+            pts_time, _, flags = line.partition(",")
+            try:
+                if "K" in flags and float(pts_time) <= time + 1e-3:
+                    keyframes.append(float(pts_time))
+            except ValueError:
+                continue
+        if keyframes:
+            return max(keyframes)
+        if read_start == 0.0:
+            return 0.0
+        window *= 2
+
+def precut_scene(input_file: str, start: float, end: float, output_path: str, padding: float = 0.5) -> float:
+    """
+    Copies the [start, end) range of a video into a small file without re-encoding. The cut starts at
+    the keyframe before `start`, so the scene begins (start - keyframe) seconds into the file; `padding`
+    seconds are kept after `end`.
+
+    Args:
+        input_file (str): Path to the video file.
+        start (float): Start of the scene in seconds.
+        end (float): End of the scene in seconds.
+        output_path (str): Path of the intermediate file, with the same container extension as the input.
+        padding (float): Seconds copied past `end`.
+
+    Returns:
+        float: Time of the source at which the intermediate file starts, or None if the cut failed.
+    """
+    keyframe = keyframe_before(input_file, start)
+    if keyframe is None:
+        return None
+    # Seeking just past the keyframe makes ffmpeg start the copy on that keyframe, not on the previous one
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-ss", f"{keyframe + 0.001:.3f}", "-i", input_file,
+        "-t", f"{end - keyframe + padding:.3f}",
+        "-map", "0:v:0", "-map", "0:a?", "-c", "copy",
+        "-avoid_negative_ts", "make_zero",
+        output_path
+    ]
+    try:
+        subprocess.run(cmd, capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        logging.error(f"Could not pre-cut {start:.2f}-{end:.2f}s of {input_file}: {e.stderr}")
+        return None
+    return keyframe
+
+def detect_silences(input_file: str, noise_db: float = -35.0, min_duration: float = 0.5) -> list[tuple]:
+    """
+    Use ffmpeg's silencedetect filter to find the silent stretches of a file's audio.
+
+    Args:
+        input_file (str): Path to the video or audio file.
+        noise_db (float): Volume under which audio counts as silence, in dB.
+        min_duration (float): Minimum length of a silence, in seconds.
+
+    Returns:
+        list[tuple]: (start, end) of each silence, in seconds.
+    """
+    cmd = [
+        "ffmpeg", "-hide_banner", "-nostats", "-i", input_file,
+        "-map", "0:a:0", "-af", f"silencedetect=noise={noise_db}dB:d={min_duration}",
+        "-f", "null", "-"
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        logging.error(f"Error in detect_silences: {e.stderr}")
+        return []
+    silences = []
+    silence_start = None
+    for line in result.stderr.splitlines():
+        start_match = re.search(r"silence_start: (-?[\d\.]+)", line)
+        if start_match:
+            silence_start = max(0.0, float(start_match.group(1)))
+            continue
+        end_match = re.search(r"silence_end: ([\d\.]+)", line)
+        if end_match and silence_start is not None:
+            silences.append((silence_start, float(end_match.group(1))))
+            silence_start = None
+    logging.debug(f"Detected {len(silences)} silences in {input_file}")
+    return silences
+
+def plan_chunks(duration: float, silences: list[tuple], chunk_seconds: float) -> list[tuple]:
+    """
+    Splits a duration into chunks of roughly `chunk_seconds`, cutting in the middle of a silence
+    whenever there is one nearby, so no word is cut in half.
+
+    Args:
+        duration (float): Total duration in seconds.
+        silences (list[tuple]): (start, end) of the silences, see detect_silences.
+        chunk_seconds (float): Target chunk length in seconds.
+
+    Returns:
+        list[tuple]: (start, end) of each chunk, covering the whole duration.
+    """
+    midpoints = sorted((start + end) / 2 for start, end in silences)
+    cuts = [0.0]
+    while duration - cuts[-1] > chunk_seconds * 1.5:
+        desired = cuts[-1] + chunk_seconds
+        candidates = [m for m in midpoints if cuts[-1] + chunk_seconds / 2 < m < cuts[-1] + chunk_seconds * 1.5]
+        cuts.append(min(candidates, key=lambda m: abs(m - desired)) if candidates else desired)
+    cuts.append(duration)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def _parse_ffmpeg_duration(line: str) -> float:
+    """Returns the duration from ffmpeg's "Duration: HH:MM:SS.xx" input header line, or None."""
+    match = re.search(r"Duration: (\d+):(\d+):([\d\.]+)", line)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+def analyze_source(input_video: str, audio_path: str = None, threshold: float = 0.8, mode: str = None) -> dict:
+    """
+    Reads the source once with a single ffmpeg invocation that writes the 16 kHz mono audio used for
+    transcription, runs scene detection on the video stream and reports the duration and streams.
+    Scene cuts are collected as ffmpeg prints them.
+    Args:
+        input_video (str): Path to the input video file.
+        audio_path (str): Path of the WAV file to write. If None, no audio is decoded (scene detection only).
+        threshold (float): The threshold for scene change detection.
+        mode (str): Scene detection mode, see detect_scenes. Defaults to config.SCENE_DETECTION_MODE.
+    Returns:
+        dict: {"audio_path", "duration", "streams", "cuts", "timestamps"} where "streams" are ffmpeg's stream
+            descriptions, "cuts" the raw scene cuts and "timestamps" the finalized scene boundaries.
+            None if ffmpeg failed.
+    """
+    if mode is None:
+        mode = config.SCENE_DETECTION_MODE
+    fast = mode == "fast"
+    cmd = ["ffmpeg", "-hide_banner", "-nostats", "-y"]
+    if fast and config.SCENE_KEYFRAMES_ONLY:
+        cmd += ["-skip_frame", "nokey"]  # Only affects the video decoder
+    cmd += ["-i", input_video]
+    if audio_path:
+        os.makedirs(os.path.dirname(audio_path) or ".", exist_ok=True)
+        cmd += ["-map", "0:a:0", "-ac", "1", "-ar", "16000", "-c:a", "pcm_s16le", audio_path]
+    cmd += [
+        "-map", "0:v:0",
+        "-vf", _scene_filters(threshold,
+                              scale_width=config.SCENE_ANALYSIS_WIDTH if fast else None,
+                              analysis_fps=config.SCENE_ANALYSIS_FPS if fast else None,
+                              keyframes_only=fast and config.SCENE_KEYFRAMES_ONLY),
+        "-f", "null", "-"
+    ]
+    analysis = {"audio_path": audio_path, "duration": None, "streams": [], "cuts": []}
+
+    def on_stdout_line(line: str):
+        pts_time = _parse_pts_time(line)
+        if pts_time is not None:
+            analysis["cuts"].append(pts_time)
+            logging.debug(f"Scene cut at {pts_time}s")
+
+    def on_stderr_line(line: str):
+        if analysis["duration"] is None:
+            analysis["duration"] = _parse_ffmpeg_duration(line)
+        if re.match(r"\s*Stream #0:", line) and len(analysis["streams"]) < 16:
+            analysis["streams"].append(line.strip())
+
+    logging.info(f"Analyzing {input_video} in a single pass ({'audio, ' if audio_path else ''}scenes, duration)...")
+    returncode, stderr = _run_ffmpeg_streaming(cmd, on_stdout_line, on_stderr_line)
+    if returncode != 0:
+        logging.error(f"Error in analyze_source: {stderr}")
+        return None
+    if analysis["duration"] is None:
+        analysis["duration"] = get_video_duration(input_video)
+    logging.info(f"Analysis complete. Duration: {analysis['duration']}s, {len(analysis['cuts'])} scene cuts.")
+
+    cuts = analysis["cuts"]
+    if fast and cuts and config.SCENE_REFINE_WINDOW:
+        logging.info(f"Refining {len(cuts)} scene cuts at full frame rate...")
+        cuts = refine_scene_cuts(input_video, cuts, threshold, config.SCENE_REFINE_WINDOW)
+    analysis["timestamps"] = finalize_scene_timestamps(cuts, analysis["duration"])
+    return analysis
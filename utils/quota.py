@@ -0,0 +1,94 @@
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+import utils.config as config
+from utils.log_utils import get_connection
+
+try:
+    from zoneinfo import ZoneInfo
+    PACIFIC = ZoneInfo("America/Los_Angeles")
+except Exception:  # No tz database: approximate with standard time
+    PACIFIC = timezone(timedelta(hours=-8))
+
+_pace_lock = threading.Lock()
+_last_request = 0.0
+
+def quota_day(now: datetime = None) -> str:
+    """Returns the quota day, YouTube Data API quotas reset at midnight Pacific time."""
+    return (now or datetime.now(timezone.utc)).astimezone(PACIFIC).strftime("%Y-%m-%d")
+
+def next_quota_reset(now: datetime = None) -> datetime:
+    """Returns the next midnight Pacific time, as an aware datetime."""
+    local = (now or datetime.now(timezone.utc)).astimezone(PACIFIC)
+    return datetime.combine(local.date() + timedelta(days=1), datetime.min.time(), tzinfo=PACIFIC)
+
+def quota_project() -> str:
+    """
+    Returns the Google Cloud project the quota is counted against: config.QUOTA_PROJECT,
+    else the project_id of client_secret.json.
+    """
+    if config.QUOTA_PROJECT:
+        return config.QUOTA_PROJECT
+    try:
+        with open("client_secret.json", "r") as f:
+            secret = json.load(f)
+        return next(iter(secret.values())).get("project_id") or "default"
+    except (OSError, ValueError, StopIteration, AttributeError):
+        return "default"
+
+def used_units(project: str = None, day: str = None) -> int:
+    """Returns the quota units consumed by this project on a quota day (default: today)."""
+    row = get_connection().execute("SELECT units, exhausted FROM quota_usage WHERE project = ? AND day = ?",
+                                   (project or quota_project(), day or quota_day())).fetchone()
+    if not row:
+        return 0
+    return config.DAILY_QUOTA_UNITS if row["exhausted"] else row["units"]
+
+def charge_units(units: int, project: str = None):
+    """Records quota units consumed by an API call."""
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            """
+            INSERT INTO quota_usage (project, day, units) VALUES (?, ?, ?)
+            ON CONFLICT(project, day) DO UPDATE SET units = quota_usage.units + excluded.units
+            """,
+            (project or quota_project(), quota_day(), units),
+        )
+
+def mark_exhausted(project: str = None):
+    """Records that the API reported the quota as exceeded, whatever the local count says."""
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            """
+            INSERT INTO quota_usage (project, day, exhausted) VALUES (?, ?, 1)
+            ON CONFLICT(project, day) DO UPDATE SET exhausted = 1
+            """,
+            (project or quota_project(), quota_day()),
+        )
+
+def remaining_uploads(project: str = None) -> int:
+    """Returns the number of uploads the remaining quota of today allows."""
+    remaining = config.DAILY_QUOTA_UNITS - used_units(project)
+    return max(0, remaining // config.UPLOAD_COST_UNITS)
+
+def pace_request():
+    """
+    Waits until at least config.UPLOAD_MIN_INTERVAL seconds have passed since the previous
+    upload request of this process started, instead of a fixed delay after each upload.
+    """
+    global _last_request
+    with _pace_lock:
+        wait = _last_request + config.UPLOAD_MIN_INTERVAL - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        _last_request = time.monotonic()
+
+def log_quota_status(project: str = None):
+    project = project or quota_project()
+    reset = next_quota_reset().strftime("%Y-%m-%d %H:%M %Z")
+    logging.info(f"Quota of {project}: {used_units(project)}/{config.DAILY_QUOTA_UNITS} units used today, "
+                 f"{remaining_uploads(project)} uploads left until {reset}.")
@@ -2,66 +2,57 @@ from moviepy import VideoFileClip, CompositeVideoClip, vfx, TextClip
 import numpy as np
 import logging
 import utils.config as config
-from utils.downloaders import download_video_if_needed
+from utils.subtitles import write_ass, subtitles_filter
+from utils.footage import get_footage_proxy, select_footage
+from utils.caption_cache import get_caption_cache
+from utils.transcript_index import TranscriptIndex
+from utils.checkpoint import RunManifest, fingerprint
+from utils.processors import precut_scene
+from utils.compositor import stack_clips
 from time import sleep
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+import threading
 import os
 
-def get_brainrot_footage(game: str=None, config_path: str="utils/config.py") -> VideoFileClip:
+MIN_SCENE_SECONDS = 20  # Shorter scenes are skipped
+MAX_SCENE_SECONDS = 180  # Longer scenes are skipped, too long for a short
+
+def load_footage_clip(footage: dict, fps: float, size: tuple=(1080, 1080)) -> tuple:
     """
-    Returns the brainrot footage for the specified game.
+    Opens a brainrot footage, using its pre-normalized proxy when config.USE_FOOTAGE_PROXIES is set.
 
     Args:
-        game (str): The game to get the brainrot footage for.
-        config_path (str): The path to the configuration file.
+        footage (dict): The footage manifest entry, see utils.footage.get_footage_entry.
+        fps (float): Frame rate of the output video.
+        size (tuple): Size of the footage area of the output video.
 
     Returns:
-        VideoFileClip, str: The specified game.
+        VideoFileClip, bool: The footage, and whether it is a proxy that is already cropped and scaled.
     """
-    
-    footages = config.brainrot_footage.get(game)
-    if not footages:
-        logging.error(f"No footage found for game '{game}'.")
-        return None
+    footage_path = footage["path"]
+    proxy_path = get_footage_proxy(footage_path, fps, size) if config.USE_FOOTAGE_PROXIES else None
+    if config.USE_FOOTAGE_PROXIES and not proxy_path:
+        logging.warning(f"No footage proxy available for {footage_path}. Using the original footage.")
+    if proxy_path:
+        logging.info(f"Loading footage proxy from path: {proxy_path}")
+        return VideoFileClip(proxy_path).without_audio(), True
+    logging.info(f"Loading footage from path: {footage_path}")
+    return VideoFileClip(footage_path).without_audio(), False
 
-    vid_list = list(footages.keys())
-    logging.info(f"{len(vid_list)} footages found for game '{game}'")
-    footage = np.random.choice(vid_list)
-    source, footage_path = footages.get(footage)
-    invalid_path = "placeholder"
-    if not source:
-        logging.error(f"Source for footage '{footage}' not found.")
-        return None
-    try:
-        result = VideoFileClip(footage_path).without_audio()
-    except Exception as e:
-        logging.warning(f"Error loading footage for game '{game}' from path: {footage_path}. Will download from source.")
-        invalid_path = f'{footage_path}'
-        footage_path = None
-    if not footage_path:
-        logging.info(f"Footage path for footage '{footage}' not found. Downloading from source: {source}")
-        footage_path = download_video_if_needed(source, output_dir=f"footage_{game}")
-        sleep(1) # Wait for a second to ensure the download is complete
-        # Update the config module with the new footage path
-        config.brainrot_footage[game][footage][1] = footage_path
-
-        # Make the change permanent in the config file
-        with open(config_path, 'r') as file:
-            config_data = file.read()
-
-        # Update the footage path in the config data
-        config_data = config_data.replace(f'"{source}", "{invalid_path}"', f'"{source}", "{footage_path}"')
-
-        # Write the updated config back to the file
-        with open(config_path, 'w') as file:
-            file.write(config_data)
-        logging.info(f"Loading footage for game '{game}' from path: {footage_path}")
-        result = VideoFileClip(footage_path).without_audio()
-
-    if not result:
-        logging.error(f"Error loading footage for game '{game}' from path: {footage_path}")
-        return None
-    return result
+def choose_game(game: str=None) -> str:
+    """
+    Returns the given game after validating it, or a random one if no game is specified.
+    """
+    brainrot_games = list(config.brainrot_footage.keys())
+    if game is None:
+        game = np.random.choice(brainrot_games)
+        logging.info(f"No game specified. Randomly selected game: {game}")
 
+    elif game not in brainrot_games:
+        logging.error(f"Game '{game}' not found in brainrot games.")
+        raise ValueError(f"Game '{game}' not found in brainrot games.")
+    return game
 
 def render(clip: VideoFileClip, resolution: tuple=(1080, 1920), game: str=None) -> VideoFileClip:
     """
@@ -75,76 +66,76 @@ def render(clip: VideoFileClip, resolution: tuple=(1080, 1920), game: str=None)
     Returns:
         VideoFileClip: The final video clip with the desired resolution.
     """
-    brainrot_games = list(config.brainrot_footage.keys())
-    if game is None:
-        game = np.random.choice(brainrot_games)
-        logging.info(f"No game specified. Randomly selected game: {game}")
-
-    elif game not in brainrot_games:
-        logging.error(f"Game '{game}' not found in brainrot games.")
-        raise ValueError(f"Game '{game}' not found in brainrot games.")
+    game = choose_game(game)
     
     try:
         #main_clip = clip.resized(height=resolution[1]//2, width=resolution[0])
         main_clip = clip.resized(height=840, width=resolution[0]) # height: 840 To make space for subtitles and to not lose too much of the main clip after cropping
         #Fill the rest of the video with brainrot footage
-        brainrot_clip = get_brainrot_footage(game)
-        brainrot_clip = brainrot_clip.cropped(
-            x_center=brainrot_clip.w / 2,
-            width=brainrot_clip.w * 0.65
-        )
-        if not brainrot_clip:
+        footage = select_footage(game)
+        if not footage:
            logging.error("Failed to get brainrot footage.")
            raise ValueError("Failed to get brainrot footage.")
+        #The trim window only needs the duration recorded in the footage manifest
+        duration_diff = footage["duration"] - main_clip.duration
+        start_time = np.random.uniform(0, duration_diff) if duration_diff > 0 else 0
+
+        target_h = 1080 # A little more than main clip height, because we want the main clip to not be cropped too much
+        brainrot_clip, is_proxy = load_footage_clip(footage, fps=main_clip.fps, size=(1080, target_h))
+        if not is_proxy:
+            brainrot_clip = brainrot_clip.cropped(
+                x_center=brainrot_clip.w / 2,
+                width=brainrot_clip.w * 0.65
+            )
         #Adjust the duration of the brainrot clip to match the main clip
-        duration_diff = brainrot_clip.duration - main_clip.duration
         if duration_diff > 0:
             #brainrot clip is longer than main clip
             #trim the brainrot clip
             #random initialisation of the start time
-            start_time = np.random.uniform(0, duration_diff)
             logging.debug(f"Trimming brainrot clip to match main clip duration. Start time: {start_time}, Duration: {main_clip.duration}")
-            brainrot_clip = brainrot_clip.subclipped(start_time, start_time + main_clip.duration)
+            brainrot_clip = brainrot_clip.subclipped(start_time, min(start_time + main_clip.duration, brainrot_clip.duration))
         elif duration_diff < 0:
             #brainrot clip is shorter than main clip
             #loop the brainrot clip
             brainrot_clip = brainrot_clip.with_effects([vfx.Loop(duration=main_clip.duration)])
 
-        #Resize the brainrot clip to match the main clip
-        orig_w, orig_h = brainrot_clip.size
-        target_h = 1080 # A little more than main clip height, because we want the main clip to not be cropped too much
-        scale_factor = target_h / orig_h
-        scaled_w = int(orig_w * scale_factor)
-        x_center = scaled_w / 2
-        x1 = x_center - (1080 / 2)
+        #Resize the brainrot clip to match the main clip, proxies are already cropped and scaled
+        if not is_proxy:
+            orig_w, orig_h = brainrot_clip.size
+            scale_factor = target_h / orig_h
+            scaled_w = int(orig_w * scale_factor)
+            x_center = scaled_w / 2
+            x1 = x_center - (1080 / 2)
 
-        brainrot_clip = brainrot_clip.resized((scaled_w, target_h)) \
-            .cropped(x1=x1, y1=0, width=1080, height=target_h)
+            brainrot_clip = brainrot_clip.resized((scaled_w, target_h)) \
+                .cropped(x1=x1, y1=0, width=1080, height=target_h)
 
         logging.debug(f"Brainrot clip resized successfully. New dimensions: {brainrot_clip.size}")
 
         #Compose main clip and brainrot clip, with brainrot clip below and main clip on top
         logging.debug(f"Main clip size and position: {main_clip.size}\n Brainrot clip size: {brainrot_clip.size}")
         sleep(1)
-        video = CompositeVideoClip([main_clip.with_position("top"), brainrot_clip.with_position("bottom")], size=resolution)
+        #The default layout tiles the frame exactly and is composited into a preallocated buffer
+        video = stack_clips(main_clip, brainrot_clip, size=resolution)
         sleep(1)
         return video
     except Exception as e:
         logging.error(f"An error occurred during rendering: {e}")
         return None
 
-def subtitle_subclip(subclip: VideoFileClip, transcript: list[dict], start: float, end: float, i: int) -> CompositeVideoClip:
+def get_local_transcript(transcript: list[dict] | TranscriptIndex, start: float, end: float) -> list[dict]:
     """
-    Subtitles a subclip with the given transcript.
+    Returns the transcript entries overlapping a subclip, shifted to the subclip's local time.
     args:
-        subclip (VideoFileClip): The subclip to subtitle.
-        transcript (list[dict]): The list of dictionaries containing subtitle information.
+        transcript (list[dict] | TranscriptIndex): The list of dictionaries containing subtitle information,
+            or an index over it, which avoids scanning the whole transcript.
         start (float): The start time of the subclip.
         end (float): The end time of the subclip.
-        i (int): The index of the subclip.
     Returns:
-        CompositeVideoClip: The final video clip with subtitles.
+        list[dict]: The entries with "start" and "end" relative to the subclip start.
     """
+    if isinstance(transcript, TranscriptIndex):
+        transcript = transcript.overlapping(start, end)
     local_transcript = []
     for entry in transcript:
         start_global = entry["start"]
@@ -169,19 +160,46 @@ def subtitle_subclip(subclip: VideoFileClip, transcript: list[dict], start: floa
                         "end": local_end,
                         "text": text
                     })
+    return local_transcript
+
+def subtitle_subclip(subclip: VideoFileClip, transcript: list[dict] | TranscriptIndex, start: float, end: float, i: int) -> CompositeVideoClip:
+    """
+    Subtitles a subclip with the given transcript.
+    args:
+        subclip (VideoFileClip): The subclip to subtitle.
+        transcript (list[dict] | TranscriptIndex): The list of dictionaries containing subtitle information, or an index over it.
+        start (float): The start time of the subclip.
+        end (float): The end time of the subclip.
+        i (int): The index of the subclip.
+    Returns:
+        CompositeVideoClip: The final video clip with subtitles.
+    """
+    local_transcript = get_local_transcript(transcript, start, end)
     logging.debug(f"Transcript for scene {i+1} created: {len(local_transcript)}")
     # 2) Build subtitle clips for *this subclip*
+    caption_cache = get_caption_cache()
     subtitle_clips = []
     for entry in local_transcript:
         if entry["end"] > entry["start"]:  # ensure non-zero duration
-            txt_clip = (TextClip(
-                text=entry["text"],
-                font="Arial",
-                color="white",
-                font_size=60,
-                stroke_color="black",
-                stroke_width=2
-            )
+            if caption_cache is not None:
+                txt_clip = caption_cache.get(
+                    text=entry["text"],
+                    font="Arial",
+                    color="white",
+                    font_size=60,
+                    stroke_color="black",
+                    stroke_width=2
+                )
+            else:
+                txt_clip = TextClip(
+                    text=entry["text"],
+                    font="Arial",
+                    color="white",
+                    font_size=60,
+                    stroke_color="black",
+                    stroke_width=2
+                )
+            txt_clip = (txt_clip
             .with_start(entry["start"])
             .with_end(entry["end"])
             .with_position(("center", 780)))  # or ("center","bottom")
@@ -193,54 +211,369 @@ def subtitle_subclip(subclip: VideoFileClip, transcript: list[dict], start: floa
     return final_video
 
 
-def prepare_shorts(clip: VideoFileClip, timestamps: list=None,
+def render_scene(clip: VideoFileClip, start: float, end: float, i: int, scene_count: int,
+                 transcript: list[dict] | TranscriptIndex, output_dir: str, resolution: tuple=(1080, 1920),
+                 game: str = None, seed: int = None, subtitle_mode: str = None) -> str:
+    """
+    Cuts, renders, subtitles and saves a single scene of a video clip.
+
+    Args:
+        clip (VideoFileClip): The original video clip.
+        start (float): The start time of the scene.
+        end (float): The end time of the scene.
+        i (int): The index of the scene.
+        scene_count (int): The total number of scenes, used for logging.
+        transcript (list[dict] | TranscriptIndex): List of dictionaries containing subtitle information, or an index over it.
+        output_dir (str): The directory to save the scene to.
+        resolution (tuple): Tuple of the desired resolution of the video.
+        game (str): The game to get the footage for.
+        seed (int): Seed for the random footage selection, so the result does not depend on the process it runs in.
+        subtitle_mode (str): "clips" or "ass". Defaults to config.SUBTITLE_MODE.
+
+    Returns:
+        str: The path of the saved scene.
+    """
+    subtitle_mode = subtitle_mode or config.SUBTITLE_MODE
+    if seed is not None:
+        np.random.seed(seed)
+    logging.info(f"Rendering scene {i+1} of {scene_count} from {start} to {end}...")
+    scene = clip.subclipped(start, end)
+
+    scene = render(scene, resolution=resolution, game=game)
+    logging.info(f"Scene {i+1} of {scene_count} rendered successfully. Duration: {scene.duration} seconds. Subtitling...")
+    os.makedirs(output_dir, exist_ok=True)
+    out_path = f"{output_dir}/scene_{i+1}.mp4"
+    if subtitle_mode == "ass":
+        # Burn a single subtitle track in during encode instead of compositing one clip per entry
+        subtitle_path = write_ass(get_local_transcript(transcript or [], start, end), f"{output_dir}/scene_{i+1}.ass", resolution)
+        logging.info(f"Scene {i+1} of {scene_count} subtitle track written. Saving...")
+        try:
+            scene.write_videofile(out_path, codec="libx264", ffmpeg_params=["-vf", subtitles_filter(subtitle_path)])
+        finally:
+            os.remove(subtitle_path)
+    else:
+        # Scene Subtitling
+        final_video = subtitle_subclip(scene, transcript, start, end, i)
+        logging.info(f"Scene {i+1} of {scene_count} subtitled successfully. Saving...")
+        #Downloading locally
+        final_video.write_videofile(out_path, codec="libx264")
+    logging.info(f"Scene {i+1} with subtitles saved to: {out_path}")
+    return out_path
+
+def _render_scene_worker(source_path: str, start: float, end: float, i: int, scene_count: int,
+                         transcript: list[dict], output_dir: str, resolution: tuple,
+                         game: str, seed: int, backend: str = "moviepy", subtitle_mode: str = None) -> tuple:
+    """
+    Process pool entry point: opens its own reader on the source video and renders one scene.
+    Returns the scene path and the caption cache counters of the scene.
+    """
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
+    if backend == "ffmpeg":
+        from utils.ffmpeg_render import render_scene_ffmpeg
+        out_path = render_scene_ffmpeg(source_path, start, end, i, scene_count, transcript, output_dir,
+                                       resolution=resolution, game=game, seed=seed, subtitle_mode=subtitle_mode)
+        return out_path, (0, 0, 0)
+    caption_cache = get_caption_cache()
+    before = caption_cache.stats() if caption_cache else (0, 0, 0)
+    with VideoFileClip(source_path) as clip:
+        out_path = render_scene(clip, start, end, i, scene_count, transcript, output_dir,
+                                resolution=resolution, game=game, seed=seed, subtitle_mode=subtitle_mode)
+    after = caption_cache.stats() if caption_cache else (0, 0, 0)
+    # Report this scene's caption cache counters back to the parent process
+    return out_path, tuple(b - a for a, b in zip(before, after))
+
+def get_scene_transcript(transcript: list[dict] | TranscriptIndex, start: float, end: float) -> list[dict]:
+    """
+    Returns the transcript entries overlapping the [start, end) range, in global time.
+    Used to ship only the relevant part of the transcript to render workers.
+    """
+    if not transcript:
+        return []
+    if isinstance(transcript, TranscriptIndex):
+        return transcript.overlapping(start, end)
+    return [entry for entry in transcript if entry["end"] > start and entry["start"] < end]
+
+def shift_transcript(transcript: list[dict], offset: float) -> list[dict]:
+    """Returns the transcript entries moved by `offset` seconds."""
+    if not offset:
+        return transcript
+    return [dict(entry, start=entry["start"] + offset, end=entry["end"] + offset) for entry in transcript]
+
+def precut_source(source_path: str, i: int, start: float, end: float, output_dir: str) -> tuple:
+    """
+    Copies a scene out of the source into its own small file (stream copy from the keyframe before the scene).
+    Renders then open and seek in that file only, and it can be handed to any worker.
+
+    Returns:
+        tuple: (path to render from, source time at which it starts). Falls back to (source_path, 0.0) if the cut fails.
+    """
+    precut_dir = os.path.join(output_dir, "precut")
+    os.makedirs(precut_dir, exist_ok=True)
+    scene_path = os.path.join(precut_dir, f"scene_{i+1}{os.path.splitext(source_path)[1] or '.mp4'}")
+    offset = precut_scene(source_path, start, end, scene_path, padding=config.PRECUT_PADDING)
+    if offset is None:
+        logging.warning(f"Could not pre-cut scene {i+1}, rendering it from the source.")
+        return source_path, 0.0
+    return scene_path, offset
+
+def remove_precut(scene_path: str, source_path: str):
+    """Deletes a pre-cut scene file once its scene is rendered."""
+    if scene_path != source_path and os.path.exists(scene_path):
+        os.remove(scene_path)
+
+def prepare_shorts(clip: VideoFileClip = None, timestamps: list=None,
                               resolution: tuple=(1080,1920), game: str = None,
                               transcript: list = None, base_output_path: str = "output",
-                              ) -> list[str]:
+                              source_path: str = None, workers: int = None,
+                              backend: str = None, manifest: RunManifest = None,
+                              render_inputs: dict = None, cancel_event: threading.Event = None,
+                              ) -> list[tuple]:
     """
     Cuts, renders, adds subtitles, and saves multiple scenes from a video clip.
 
     Args:
-        clip (VideoFileClip): The original video clip.
+        clip (VideoFileClip): The original video clip. Only used when rendering sequentially.
         timestamps (list): List of timestamps to split the video into scenes.
         transcript (list): List of dictionaries containing subtitle information with keys "start", "end", and "text".
+            It is indexed once here, so each scene only looks up its own entries.
         base_output_path (str): The base directory to save the prepared videos.
+        source_path (str): Path of the original video. Required for parallel rendering, each worker opens its own reader.
+        workers (int): Number of render processes. Defaults to config.RENDER_WORKERS, 1 renders sequentially.
+        backend (str): "moviepy" or "ffmpeg". Defaults to config.RENDER_BACKEND. The ffmpeg backend requires source_path.
+        manifest (RunManifest): Run manifest of the video. Scenes it records as rendered with the same inputs are skipped.
+        render_inputs (dict): Fingerprint inputs of the render (source hash, settings), recorded with each scene.
+        cancel_event (threading.Event): Once set, no further scene is started; the scenes rendered so far are returned.
 
     Returns:
-        list[str]: List of file paths for each prepared video.
+        list[tuple]: (scene index, file path) of each prepared video, in scene order.
+            The index numbers the parts when uploading.
     """
-    subclips = []
-    try:
-        scene_count = len(timestamps) - 1
-        for i in range(scene_count):
-            start = timestamps[i]
-            end = timestamps[i + 1]
-            if end-start < 20:
-                logging.info(f"Scene {i+1} is too short. Skipping...")
+    results = dict(iter_shorts(clip=clip, timestamps=timestamps, resolution=resolution, game=game,
+                               transcript=transcript, base_output_path=base_output_path,
+                               source_path=source_path, workers=workers, backend=backend,
+                               manifest=manifest, render_inputs=render_inputs, cancel_event=cancel_event))
+    return [(i, results[i]) for i in sorted(results)]
+
+def iter_shorts(clip: VideoFileClip = None, timestamps: list=None,
+                resolution: tuple=(1080,1920), game: str = None,
+                transcript: list = None, base_output_path: str = "output",
+                source_path: str = None, workers: int = None,
+                backend: str = None, manifest: RunManifest = None,
+                render_inputs: dict = None, cancel_event: threading.Event = None):
+    """
+    Same as prepare_shorts, but yields each scene as soon as it is rendered, so it can be
+    uploaded while the next ones render. Scenes already rendered by a previous run are yielded first.
+    Rendering only advances while the consumer takes scenes: with parallel workers,
+    at most `workers` scenes are rendering or waiting to be taken at a time.
+    Once `cancel_event` is set, no further scene is started.
+
+    Yields:
+        tuple: (scene index, file path), in completion order.
+    """
+    if workers is None:
+        workers = config.RENDER_WORKERS
+    if backend is None:
+        backend = config.RENDER_BACKEND
+    if backend == "ffmpeg" and not source_path:
+        logging.error("The ffmpeg render backend needs the source path. Cannot prepare shorts.")
+        return
+    if not isinstance(transcript, TranscriptIndex):
+        transcript = TranscriptIndex(transcript)
+    output_dir = os.path.join(base_output_path, "scenes")
+    scene_count = len(timestamps) - 1
+    scenes = []
+    rendered = []
+    for i in range(scene_count):
+        start = timestamps[i]
+        end = timestamps[i + 1]
+        if end-start < MIN_SCENE_SECONDS:
+            logging.info(f"Scene {i+1} is too short. Skipping...")
+            continue
+        if end-start > MAX_SCENE_SECONDS:
+            logging.error(f"Scene {i+1} is too long. Skipping...")
+            continue
+        if manifest:
+            done = manifest.get_scene(i, _scene_inputs(render_inputs, start, end))
+            if done and os.path.exists(done["path"]):
+                logging.info(f"Scene {i+1} already rendered to {done['path']}. Skipping...")
+                rendered.append((i, done["path"]))
                 continue
-            if end-start > 180:
-                logging.error(f"Scene {i+1} is too long. Skipping...")
+            if done:
+                logging.info(f"Scene {i+1} already rendered and no longer on disk (uploaded). Skipping...")
                 continue
-            logging.info(f"Rendering scene {i+1} of {scene_count} from {start} to {end}...")
-            scene = clip.subclipped(start, end)
-
-            scene = render(scene, resolution=resolution)
-            logging.info(f"Scene {i+1} of {scene_count} rendered successfully. Duration: {scene.duration} seconds. Subtitling...")   
-            # Scene Subtitling
-            final_video = subtitle_subclip(scene, transcript, start, end, i)
-            logging.info(f"Scene {i+1} of {scene_count} subtitled successfully. Saving...")
-            #Downloading locally
-            output_dir = os.path.join(base_output_path, "scenes")
-            if not os.path.exists(output_dir):
-                os.makedirs(output_dir, exist_ok=True)
-            out_path = f"{output_dir}/scene_{i+1}.mp4"
-            final_video.write_videofile(out_path, codec="libx264")
-            logging.info(f"Scene {i+1} with subtitles saved to: {out_path}")
-            subclips.append(out_path)
+        seed = int(np.random.randint(0, 2**31 - 1))
+        scenes.append((i, start, end, seed))
+    yield from rendered
+
+    def on_rendered(i: int, start: float, end: float, out_path: str):
+        if manifest:
+            manifest.set_scene(i, _scene_inputs(render_inputs, start, end), out_path)
+
+    precut = bool(config.PRECUT_SCENES and source_path)
+    if config.DISTRIBUTED_RENDER and source_path:
+        yield from _prepare_shorts_distributed(source_path, scenes, scene_count, transcript, output_dir,
+                                               resolution=resolution, game=game, backend=backend,
+                                               render_inputs=render_inputs, on_rendered=on_rendered, precut=precut,
+                                               cancel_event=cancel_event)
+        return
+    if workers > 1 and source_path:
+        yield from _prepare_shorts_parallel(source_path, scenes, scene_count, transcript, output_dir,
+                                            resolution=resolution, game=game, workers=workers, backend=backend,
+                                            on_rendered=on_rendered, precut=precut, cancel_event=cancel_event)
+        return
+    if backend == "ffmpeg":
+        from utils.ffmpeg_render import render_scene_ffmpeg
+    elif clip is None and scenes and not precut:
+        logging.error("No clip or source path given. Cannot prepare shorts.")
+        return
+
+    try:
+        for n, (i, start, end, seed) in enumerate(scenes):
+            if cancel_event and cancel_event.is_set():
+                logging.warning(f"Rendering cancelled, {len(scenes) - n} scenes left.")
+                break
+            if precut:
+                # Render from the scene's own small file, in its local time
+                scene_path, offset = precut_source(source_path, i, start, end, output_dir)
+                scene_transcript = shift_transcript(get_scene_transcript(transcript, start, end), -offset)
+                try:
+                    out_path, _ = _render_scene_worker(scene_path, start - offset, end - offset, i, scene_count,
+                                                       scene_transcript, output_dir, resolution, game, seed, backend)
+                finally:
+                    remove_precut(scene_path, source_path)
+            elif backend == "ffmpeg":
+                out_path = render_scene_ffmpeg(source_path, start, end, i, scene_count, transcript, output_dir,
+                                               resolution=resolution, game=game, seed=seed)
+            else:
+                out_path = render_scene(clip, start, end, i, scene_count, transcript, output_dir,
+                                        resolution=resolution, game=game, seed=seed)
+            on_rendered(i, start, end, out_path)
+            yield i, out_path
             sleep(5) # Rest for 5 seconds
-        return subclips
+        if get_caption_cache():
+            get_caption_cache().log_stats()
     except Exception as e:
         logging.error(f"An error occurred while preparing shorts: {e}")
-    except KeyboardInterrupt:
-        logging.error("Process interrupted.")
-        return subclips
\ No newline at end of file
+
+def all_scenes_done(timestamps: list, manifest: RunManifest, render_inputs: dict = None) -> bool:
+    """
+    Returns True if the manifest records every scene of a usable length as rendered with these inputs,
+    and none of them is on disk anymore (uploaded and deleted): a rerun has nothing left to do.
+    """
+    done = 0
+    for i in range(len(timestamps) - 1):
+        start, end = timestamps[i], timestamps[i + 1]
+        if not MIN_SCENE_SECONDS <= end - start <= MAX_SCENE_SECONDS:
+            continue
+        scene = manifest.get_scene(i, _scene_inputs(render_inputs, start, end))
+        if not scene or os.path.exists(scene["path"]):
+            return False
+        done += 1
+    return done > 0
+
+def _scene_inputs(render_inputs: dict, start: float, end: float) -> dict:
+    """Fingerprint inputs of one scene: the render inputs plus the scene's time range."""
+    return dict(render_inputs or {}, start=start, end=end)
+
+def _prepare_shorts_parallel(source_path: str, scenes: list[tuple], scene_count: int,
+                             transcript: list, output_dir: str, resolution: tuple,
+                             game: str, workers: int, backend: str = "moviepy",
+                             on_rendered=None, precut: bool = False, cancel_event: threading.Event = None):
+    """
+    Renders scenes in a process pool and yields (i, path) for each finished scene.
+    A failing scene is logged and left out, the other scenes are still rendered.
+    on_rendered(i, start, end, path) is called in this process for every finished scene.
+    Scenes are submitted as workers free up, so no more than `workers` scenes are in flight.
+    With `precut`, each worker gets its scene's own small file instead of the whole source.
+    Once `cancel_event` is set, no further scene is submitted; the scenes in flight are finished.
+    """
+    logging.info(f"Rendering {len(scenes)} scenes with {workers} worker processes...")
+    caption_cache = get_caption_cache()
+    remaining = iter(scenes)
+    # spawn: workers must not inherit reader threads or open file handles of the parent.
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as executor:
+        futures = {}
+
+        def submit_next() -> bool:
+            if cancel_event and cancel_event.is_set():
+                return False
+            scene = next(remaining, None)
+            if scene is None:
+                return False
+            i, start, end, seed = scene
+            scene_path, offset = precut_source(source_path, i, start, end, output_dir) if precut else (source_path, 0.0)
+            scene_transcript = shift_transcript(get_scene_transcript(transcript, start, end), -offset)
+            future = executor.submit(_render_scene_worker, scene_path, start - offset, end - offset, i, scene_count,
+                                     scene_transcript, output_dir, resolution, game, seed, backend)
+            futures[future] = (i, start, end, scene_path)
+            return True
+
+        for _ in range(workers):
+            submit_next()
+        while futures:
+            future = next(as_completed(futures))
+            i, start, end, scene_path = futures.pop(future)
+            remove_precut(scene_path, source_path)
+            try:
+                out_path, cache_stats = future.result()
+                if caption_cache:
+                    caption_cache.add_stats(cache_stats)
+                on_rendered(i, start, end, out_path)
+            except Exception as e:
+                logging.error(f"An error occurred while preparing scene {i+1}: {e}")
+                submit_next()
+                continue
+            submit_next()
+            yield i, out_path
+        if cancel_event and cancel_event.is_set():
+            logging.warning("Rendering cancelled, the remaining scenes were not started.")
+    if caption_cache:
+        caption_cache.log_stats()
+
+def _prepare_shorts_distributed(source_path: str, scenes: list[tuple], scene_count: int,
+                                transcript: list, output_dir: str, resolution: tuple,
+                                game: str, backend: str = "moviepy", render_inputs: dict = None,
+                                on_rendered=None, precut: bool = False, cancel_event: threading.Event = None):
+    """
+    Puts every scene in the shared render queue and yields (i, path) as render workers finish them,
+    on this host or others (python -m utils.render_queue worker). Failed scenes are logged and left out.
+    Source and output paths are made absolute; workers must see them at the same paths.
+    Once `cancel_event` is set, this stops waiting; the queued scenes stay in the queue, and a later run
+    of the same batch picks up the ones rendered meanwhile.
+    """
+    from utils.render_queue import RenderQueue, wait_for_batch
+    queue = RenderQueue()
+    source_path = os.path.abspath(source_path)
+    output_dir = os.path.abspath(output_dir)
+    batch = fingerprint(dict(render_inputs or {}, source_path=source_path))
+    scene_paths = {}
+    for i, start, end, seed in scenes:
+        # Pre-cut scenes are written next to the output, so workers copy a few MB instead of reading the source
+        scene_path, offset = precut_source(source_path, i, start, end, output_dir) if precut else (source_path, 0.0)
+        scene_paths[i] = scene_path
+        queue.enqueue(batch, i, {
+            "source_path": scene_path,
+            "start": start - offset,
+            "end": end - offset,
+            "scene_count": scene_count,
+            "transcript": shift_transcript(get_scene_transcript(transcript, start, end), -offset),
+            "output_dir": output_dir,
+            "resolution": list(resolution),
+            "game": game,
+            "seed": seed,
+            "backend": backend,
+            "subtitle_mode": config.SUBTITLE_MODE,
+        })
+    logging.info(f"Queued {len(scenes)} scenes for render workers in {queue.path} (batch {batch[:12]}).")
+    for item in wait_for_batch(queue, batch, cancel_event=cancel_event):
+        i = item["scene"]
+        scene = next((scene for scene in scenes if scene[0] == i), None)
+        if scene is None:
+            continue  # Left over from a previous run of the same batch, already recorded by the manifest
+        remove_precut(scene_paths[i], source_path)
+        if item["status"] != "done":
+            logging.error(f"An error occurred while preparing scene {i+1}: {item['error']}")
+            continue
+        on_rendered(i, scene[1], scene[2], item["result_path"])
+        yield i, item["result_path"]
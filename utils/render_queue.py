@@ -0,0 +1,301 @@
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+import utils.config as config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS render_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch TEXT NOT NULL,
+    scene INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result_path TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    UNIQUE (batch, scene)
+);
+CREATE INDEX IF NOT EXISTS render_items_status ON render_items(status, lease_expires);
+"""
+NO_WORKER_WARN_SECONDS = 60  # The waiting pipeline warns when no worker has rendered any of its scenes for this long
+
+class RenderQueue:
+    """
+    Queue of scene render work items shared by render workers on any number of hosts.
+    Each item holds everything needed to render one scene (source path, time range, scene transcript,
+    footage game and seed, render settings). A worker claims an item with a time-limited lease and renews it
+    with heartbeats while rendering; an item whose lease expires (crashed or disconnected worker) is
+    handed to another worker, up to config.RENDER_MAX_ATTEMPTS times.
+
+    The queue is a SQLite file: put it, the source videos and the output directories on storage
+    every worker can reach with the same paths.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or config.RENDER_QUEUE_FILE
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            # Rollback journal rather than WAL: WAL needs shared memory, which network filesystems do not provide
+            conn.execute("PRAGMA journal_mode=DELETE")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, batch: str, scene: int, payload: dict):
+        """
+        Adds a scene to render. A scene already queued for this batch is replaced, unless it is being rendered or done.
+        """
+        self._connect().execute(
+            """
+            INSERT INTO render_items (batch, scene, payload, status, updated_at) VALUES (?, ?, ?, 'queued', ?)
+            ON CONFLICT(batch, scene) DO UPDATE SET payload = excluded.payload, status = 'queued',
+                attempts = 0, error = NULL, updated_at = excluded.updated_at
+            WHERE render_items.status IN ('queued', 'failed')
+            """,
+            (batch, scene, json.dumps(payload), time.time()),
+        )
+
+    @staticmethod
+    def _fail_expired(conn: sqlite3.Connection, now: float) -> int:
+        """Items whose worker stopped renewing the lease and that are out of attempts have failed."""
+        cursor = conn.execute(
+            """
+            UPDATE render_items SET status = 'failed', error = 'lease expired', updated_at = ?
+            WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?
+            """,
+            (now, now, config.RENDER_MAX_ATTEMPTS))
+        return cursor.rowcount
+
+    def reap(self) -> int:
+        """
+        Fails the items that are out of attempts and whose last lease expired, even if no worker claims anymore.
+
+        Returns:
+            int: The number of failed items.
+        """
+        return self._fail_expired(self._connect(), time.time())
+
+    def claim(self, worker: str, lease_seconds: float = None) -> dict:
+        """
+        Leases the oldest queued item, or an item whose lease expired, to a worker.
+
+        Returns:
+            dict: The item with its decoded payload, or None if there is nothing to render.
+        """
+        lease_seconds = lease_seconds or config.RENDER_LEASE_SECONDS
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._fail_expired(conn, now)
+            row = conn.execute(
+                """
+                SELECT * FROM render_items
+                WHERE status = 'queued' OR (status = 'leased' AND lease_expires < ?)
+                ORDER BY id LIMIT 1
+                """,
+                (now,)).fetchone()
+            if row:
+                if row["status"] == "leased":
+                    logging.warning(f"Lease of scene {row['scene'] + 1} ({row['batch']}) held by {row['worker']} expired. Retrying.")
+                conn.execute(
+                    """
+                    UPDATE render_items SET status = 'leased', worker = ?, lease_expires = ?,
+                        attempts = attempts + 1, updated_at = ?
+                    WHERE id = ?
+                    """,
+                    (worker, now + lease_seconds, now, row["id"]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if not row:
+            return None
+        item = dict(row, worker=worker, attempts=row["attempts"] + 1)
+        item["payload"] = json.loads(item["payload"])
+        return item
+
+    def heartbeat(self, item_id: int, worker: str, lease_seconds: float = None) -> bool:
+        """
+        Extends the lease of an item.
+
+        Returns:
+            bool: False if the worker lost the lease (it expired and the item went to another worker).
+        """
+        lease_seconds = lease_seconds or config.RENDER_LEASE_SECONDS
+        cursor = self._connect().execute(
+            "UPDATE render_items SET lease_expires = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+            (time.time() + lease_seconds, time.time(), item_id, worker))
+        return cursor.rowcount > 0
+
+    def complete(self, item_id: int, worker: str, result_path: str) -> bool:
+        """Records the rendered scene. Returns False if the worker no longer held the lease."""
+        cursor = self._connect().execute(
+            "UPDATE render_items SET status = 'done', result_path = ?, error = NULL, updated_at = ? "
+            "WHERE id = ? AND worker = ? AND status = 'leased'",
+            (result_path, time.time(), item_id, worker))
+        return cursor.rowcount > 0
+
+    def fail(self, item_id: int, worker: str, error: str):
+        """Records a failed render. The item is queued again until it runs out of attempts."""
+        self._connect().execute(
+            """
+            UPDATE render_items SET status = CASE WHEN attempts < ? THEN 'queued' ELSE 'failed' END,
+                error = ?, lease_expires = NULL, updated_at = ?
+            WHERE id = ? AND worker = ? AND status = 'leased'
+            """,
+            (config.RENDER_MAX_ATTEMPTS, error, time.time(), item_id, worker))
+
+    def items(self, batch: str = None) -> list[dict]:
+        """Returns the items of a batch (or of all batches), without their payload."""
+        query = "SELECT id, batch, scene, status, worker, lease_expires, attempts, result_path, error, updated_at FROM render_items"
+        params = ()
+        if batch:
+            query, params = query + " WHERE batch = ?", (batch,)
+        return [dict(row) for row in self._connect().execute(query + " ORDER BY id", params)]
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+def render_item(item: dict) -> str:
+    """Renders the scene of a work item, with the render settings it carries. Returns the scene path."""
+    from utils.render import _render_scene_worker
+    payload = item["payload"]
+    # The item's settings win over this worker's configuration, all workers of a batch render alike
+    out_path, _ = _render_scene_worker(payload["source_path"], payload["start"], payload["end"], item["scene"],
+                                       payload["scene_count"], payload["transcript"], payload["output_dir"],
+                                       tuple(payload["resolution"]), payload.get("game"), payload["seed"],
+                                       payload.get("backend", "moviepy"), subtitle_mode=payload.get("subtitle_mode"))
+    return out_path
+
+def run_worker(queue: RenderQueue = None, worker: str = None, once: bool = False, poll_seconds: float = None) -> int:
+    """
+    Claims and renders work items until interrupted (or until the queue is empty with `once`).
+    A heartbeat thread renews the lease while a scene renders.
+
+    Returns:
+        int: The number of scenes rendered.
+    """
+    queue = queue or RenderQueue()
+    worker = worker or default_worker_id()
+    poll_seconds = poll_seconds or config.RENDER_POLL_SECONDS
+    lease_seconds = config.RENDER_LEASE_SECONDS
+    rendered = 0
+    logging.info(f"Render worker {worker} polling {queue.path}")
+    while True:
+        item = queue.claim(worker, lease_seconds)
+        if item is None:
+            if once:
+                return rendered
+            time.sleep(poll_seconds)
+            continue
+        logging.info(f"Rendering scene {item['scene'] + 1} of {item['batch']} (attempt {item['attempts']})...")
+        done = threading.Event()
+
+        def heartbeat():
+            while not done.wait(lease_seconds / 3):
+                if not queue.heartbeat(item["id"], worker, lease_seconds):
+                    logging.warning(f"Lost the lease of scene {item['scene'] + 1} of {item['batch']}.")
+                    return
+
+        beat = threading.Thread(target=heartbeat, daemon=True)
+        beat.start()
+        try:
+            out_path = render_item(item)
+        except Exception as e:
+            logging.error(f"Scene {item['scene'] + 1} of {item['batch']} failed: {e}")
+            queue.fail(item["id"], worker, str(e))
+            continue
+        finally:
+            done.set()
+            beat.join()
+        if queue.complete(item["id"], worker, out_path):
+            rendered += 1
+            logging.info(f"Scene {item['scene'] + 1} of {item['batch']} rendered: {out_path}")
+
+def wait_for_batch(queue: RenderQueue, batch: str, poll_seconds: float = None, cancel_event: threading.Event = None):
+    """
+    Yields each item of a batch once it is done or has failed for good, until none is left
+    or `cancel_event` is set. Lets the coordinator hand over scenes as soon as any worker finishes them.
+    Warns while no worker is rendering, and gives up after config.RENDER_IDLE_TIMEOUT seconds without
+    any; the remaining scenes stay queued for a later run.
+    """
+    poll_seconds = poll_seconds or config.RENDER_POLL_SECONDS
+    reported = set()
+    progress = None
+    last_activity = last_warning = time.monotonic()
+    while True:
+        if cancel_event and cancel_event.is_set():
+            logging.warning(f"Stopped waiting for batch {batch[:12]}, its scenes stay queued.")
+            return
+        queue.reap()
+        items = queue.items(batch)
+        for item in items:
+            if item["id"] not in reported and item["status"] in ("done", "failed"):
+                reported.add(item["id"])
+                yield item
+        if len(reported) == len(items):
+            return
+        leased = sum(item["status"] == "leased" for item in items)
+        now = time.monotonic()
+        if (len(reported), leased) != progress:
+            progress = (len(reported), leased)
+            logging.info(f"{len(reported)}/{len(items)} scenes finished, {leased} rendering on "
+                         f"{len({item['worker'] for item in items if item['status'] == 'leased'})} workers.")
+            last_activity = now
+        if leased:
+            last_activity = now
+        idle = now - last_activity
+        if config.RENDER_IDLE_TIMEOUT and idle >= config.RENDER_IDLE_TIMEOUT:
+            logging.error(f"No render worker took a scene of batch {batch[:12]} for {idle:.0f}s. Giving up, "
+                          f"{len(items) - len(reported)} scenes stay queued.")
+            return
+        if idle >= NO_WORKER_WARN_SECONDS and now - last_warning >= NO_WORKER_WARN_SECONDS:
+            last_warning = now
+            logging.warning(f"No render worker has taken a scene of batch {batch[:12]} for {idle:.0f}s. "
+                            f"Start one with: python -m utils.render_queue worker --queue {queue.path}")
+        time.sleep(poll_seconds)
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.render_queue", description="Distributed scene rendering.")
+    parser.add_argument("--queue", default=None, help="Queue file (default: config.RENDER_QUEUE_FILE)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker = commands.add_parser("worker", help="Render scenes from the queue")
+    worker.add_argument("--id", default=None, help="Worker name (default: host-pid-random)")
+    worker.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    status = commands.add_parser("status", help="List the work items")
+    status.add_argument("--batch", default=None, help="Only list the items of this batch")
+    args = parser.parse_args(argv)
+
+    queue = RenderQueue(args.queue)
+    if args.command == "worker":
+        try:
+            rendered = run_worker(queue, worker=args.id, once=args.once)
+        except KeyboardInterrupt:
+            return 0
+        print(f"Rendered {rendered} scenes.")
+    elif args.command == "status":
+        for item in queue.items(args.batch):
+            print(f"{item['id']:>5}  {item['batch'][:12]}  scene {item['scene'] + 1:>3}  {item['status']:<7} "
+                  f"{item['attempts']} attempts  {item['worker'] or '-'}  {item['result_path'] or item['error'] or ''}")
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
+    sys.exit(main())
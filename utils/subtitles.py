@@ -0,0 +1,107 @@
+import os
+import logging
+
+# Same styling as the TextClips of subtitle_subclip: Arial 60px, white with a 2px black stroke,
+# horizontally centered with the top of the text at y=780.
+SUBTITLE_STYLE = {
+    "font": "Arial",
+    "font_size": 60,
+    "color": "&H00FFFFFF",
+    "stroke_color": "&H00000000",
+    "stroke_width": 2,
+    "y": 780,
+}
+
+def format_ass_time(seconds: float) -> str:
+    """
+    Formats seconds as an ASS timestamp (H:MM:SS.cc).
+    """
+    centiseconds = int(round(max(0.0, seconds) * 100))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    secs, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+
+def escape_ass_text(text: str) -> str:
+    """
+    Escapes characters that ASS would interpret as override blocks or line breaks.
+    """
+    text = text.strip().replace("\\", "\\\\")
+    text = text.replace("{", "\\{").replace("}", "\\}")
+    return text.replace("\r", "").replace("\n", "\\N")
+
+def build_ass(local_transcript: list[dict], resolution: tuple=(1080, 1920)) -> str:
+    """
+    Builds an ASS subtitle track from a transcript in the scene's local time.
+
+    Args:
+        local_transcript (list[dict]): Transcript entries with "start", "end" and "text".
+        resolution (tuple): Resolution of the video the track is burned into.
+
+    Returns:
+        str: The content of the .ass file.
+    """
+    width, height = resolution
+    style = SUBTITLE_STYLE
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "ScaledBorderAndShadow: yes",
+        "WrapStyle: 2",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+        "Alignment, MarginL, MarginR, MarginV, Encoding",
+        # Alignment 8: top center, so MarginV is the distance from the top of the frame
+        f"Style: Default,{style['font']},{style['font_size']},{style['color']},{style['color']},"
+        f"{style['stroke_color']},&H00000000,0,0,0,0,100,100,0,0,1,{style['stroke_width']},0,"
+        f"8,0,0,{style['y']},1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    for entry in local_transcript:
+        if entry["end"] <= entry["start"]:  # ensure non-zero duration
+            continue
+        text = escape_ass_text(entry["text"])
+        if not text:
+            continue
+        lines.append(f"Dialogue: 0,{format_ass_time(entry['start'])},{format_ass_time(entry['end'])},Default,,0,0,0,,{text}")
+    return "\n".join(lines) + "\n"
+
+def write_ass(local_transcript: list[dict], path: str, resolution: tuple=(1080, 1920)) -> str:
+    """
+    Writes the ASS subtitle track of a scene to the given path.
+
+    Args:
+        local_transcript (list[dict]): Transcript entries in the scene's local time.
+        path (str): The path of the .ass file.
+        resolution (tuple): Resolution of the video the track is burned into.
+
+    Returns:
+        str: The path of the written file.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(build_ass(local_transcript, resolution))
+    logging.debug(f"Subtitle track with {len(local_transcript)} entries written to: {path}")
+    return path
+
+def _escape(text: str, special: str) -> str:
+    return "".join("\\" + char if char in special else char for char in text)
+
+def escape_filter_text(text: str) -> str:
+    """
+    Escapes a string so it can be used as an unquoted option value inside a filtergraph.
+    The value is parsed twice, once as a filter option and once as part of the graph.
+    """
+    return _escape(_escape(text, "\\':"), "\\'[],;")
+
+def subtitles_filter(path: str) -> str:
+    """
+    Returns the ffmpeg filter burning the given subtitle track into the video.
+    """
+    return f"subtitles=filename={escape_filter_text(path)}"
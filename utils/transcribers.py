@@ -1,14 +1,21 @@
-import whisper
 from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound
 import logging
 from urllib.parse import urlparse, parse_qs
 import wave
 import json
 import vosk
+import time
+import numpy as np
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import os
 import assemblyai as aai
 import ffmpeg
 import utils.config as config
+from utils.transcript_store import TranscriptStore, audio_content_hash
+from utils.model_registry import get_model
+from utils.processors import get_video_duration, detect_silences, plan_chunks
 
 def youtube_url_to_id(video_url: str) -> str:
     """
@@ -93,12 +100,12 @@ def transcribe_audio_whisper(audio_path: str, model_name: str = None) -> list:
     if model_name is None:
         model_name = "small"
         logging.info(f"No Whisper model specified. Using default model instead.")
-    logging.info(f"Loading Whisper model: {model_name}")
-    model = whisper.load_model(model_name)
+    model = get_model("whisper", model_name)
     logging.info(f"Starting Whisper transcription for {audio_path} with model {model_name}")
     try:
+        start = time.perf_counter()
         result = model.transcribe(audio_path, word_timestamps=False)
-        logging.info(f"Whisper transcription completed.")
+        logging.info(f"Whisper transcription completed in {time.perf_counter() - start:.1f}s.")
         segments = []
         for segment in result["segments"]:
             segments.append({
@@ -111,6 +118,71 @@ def transcribe_audio_whisper(audio_path: str, model_name: str = None) -> list:
         logging.error(f"Whisper transcription failed: {e}")
         return []
 
+def _init_whisper_worker(threads: int):
+    """Process pool initializer: limits the CPU threads torch uses in this worker."""
+    import torch
+    torch.set_num_threads(threads)
+
+def _whisper_chunk_worker(audio_path: str, model_name: str, start: float, end: float) -> list[dict]:
+    """
+    Process pool entry point: transcribes one chunk of a 16 kHz mono WAV file,
+    with timestamps in global time. The model is loaded once per worker process.
+    """
+    with wave.open(audio_path, "rb") as wf:
+        rate = wf.getframerate()
+        wf.setpos(int(start * rate))
+        frames = wf.readframes(int((end - start) * rate))
+    audio = np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+    model = get_model("whisper", model_name)
+    result = model.transcribe(audio, word_timestamps=False, fp16=False)
+    return [{
+        "start": start + segment["start"],
+        "end": min(start + segment["end"], end),
+        "text": segment["text"]
+    } for segment in result["segments"]]
+
+def transcribe_parallel_whisper(audio_path: str, model_name: str = None, workers: int = None,
+                                chunk_seconds: float = None, threads_per_worker: int = None) -> list[dict]:
+    """
+    Transcribe audio using Whisper in a process pool. The audio is split at silences into chunks
+    of about `chunk_seconds`, transcribed concurrently by workers that each hold their own model,
+    and merged back in order.
+
+    Args:
+        audio_path (str): Path to the 16 kHz mono WAV file, see extract_audio.
+        model_name (str): Name of the Whisper model.
+        workers (int): Number of worker processes. Defaults to config.TRANSCRIBE_WORKERS.
+        chunk_seconds (float): Target chunk length. Defaults to config.TRANSCRIBE_CHUNK_SECONDS.
+        threads_per_worker (int): Torch CPU threads per worker. Defaults to config.WHISPER_THREADS_PER_WORKER.
+
+    Returns:
+        list[dict]: Subtitle-ready segments with start, end, and text.
+    """
+    if model_name is None:
+        model_name = "small"
+        logging.info(f"No Whisper model specified. Using default model instead.")
+    workers = workers or config.TRANSCRIBE_WORKERS
+    chunk_seconds = chunk_seconds or config.TRANSCRIBE_CHUNK_SECONDS
+    threads_per_worker = threads_per_worker or config.WHISPER_THREADS_PER_WORKER
+    with wave.open(audio_path, "rb") as wf:
+        duration = wf.getnframes() / wf.getframerate()
+    chunks = plan_chunks(duration, detect_silences(audio_path), chunk_seconds)
+    logging.info(f"Starting Whisper transcription for {audio_path} with model {model_name} "
+                 f"in {len(chunks)} chunks with {workers} workers x {threads_per_worker} threads")
+    start = time.perf_counter()
+    ctx = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_whisper_worker,
+                                 initargs=(threads_per_worker,)) as executor:
+            results = executor.map(_whisper_chunk_worker, [audio_path] * len(chunks), [model_name] * len(chunks),
+                                   [chunk[0] for chunk in chunks], [chunk[1] for chunk in chunks])
+            segments = [segment for chunk_segments in results for segment in chunk_segments]
+    except Exception as e:
+        logging.error(f"Whisper transcription failed: {e}")
+        return []
+    logging.info(f"Whisper transcription completed in {time.perf_counter() - start:.1f}s.")
+    return segments
+
 def transcribe_audio_vosk(audio_path: str, model_name: str = None) -> list[dict]:
     """
     Transcribe audio using Vosk and return subtitle-ready segments.
@@ -120,9 +192,9 @@ def transcribe_audio_vosk(audio_path: str, model_name: str = None) -> list[dict]
         model_name = "vosk-model-small-en-us-0.15"
         logging.info(f"No Vosk model specified. Using default model instead.")
         
+    model = get_model("vosk", model_name)
     logging.info(f"Starting Vosk transcription for {audio_path} with model {model_name}")
-    model_path = os.path.join(config.VOSK_DIRECTORY, model_name)
-    model = vosk.Model(model_path)
+    start = time.perf_counter()
 
     wf = wave.open(audio_path, "rb")
 
@@ -163,7 +235,133 @@ def transcribe_audio_vosk(audio_path: str, model_name: str = None) -> list[dict]
             })
 
     wf.close()
-    logging.info(f"Vosk transcription completed for {audio_path}")
+    logging.info(f"Vosk transcription completed for {audio_path} in {time.perf_counter() - start:.1f}s")
+    return segments
+
+PCM_SAMPLE_RATE = 16000
+PCM_BUFFER_BYTES = 128 * 1024  # 4 seconds of 16 kHz mono s16le audio per read
+
+def _open_pcm_stream(media_path: str, start: float = None, duration: float = None) -> subprocess.Popen:
+    """
+    Starts ffmpeg decoding the first audio stream of a file to 16 kHz mono 16-bit PCM on its stdout.
+    """
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error"]
+    if start:
+        cmd += ["-ss", f"{start:.3f}"]
+    if duration is not None:
+        cmd += ["-t", f"{duration:.3f}"]
+    cmd += ["-i", media_path, "-map", "0:a:0", "-ac", "1", "-ar", str(PCM_SAMPLE_RATE), "-f", "s16le", "-"]
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+def _close_pcm_stream(process: subprocess.Popen, check: bool = True):
+    """
+    Closes the pipe and waits for ffmpeg. With `check`, a failed decode raises ValueError; pass False when
+    recognition already failed, ffmpeg then exits with an error because its stdout was closed early.
+    """
+    process.stdout.close()
+    stderr = process.stderr.read().decode(errors="replace")
+    if process.wait() != 0:
+        if not check:
+            logging.debug(f"FFmpeg exited with {process.returncode} after the pipe was closed: {stderr}")
+            return
+        logging.error(f"FFmpeg failed to decode audio: {stderr}")
+        raise ValueError(f"FFmpeg failed to decode audio. {stderr}")
+
+def _recognize_stream(model, process: subprocess.Popen, offset: float = 0.0) -> list[dict]:
+    """Recognizes an ffmpeg PCM stream and closes it, without hiding a recognition error behind ffmpeg's."""
+    try:
+        segments = _recognize_pcm(model, process.stdout, offset=offset)
+    except BaseException:
+        _close_pcm_stream(process, check=False)
+        raise
+    _close_pcm_stream(process)
+    return segments
+
+def _vosk_words(result: str, offset: float = 0.0) -> list[dict]:
+    """Converts a Vosk JSON result to segments, shifted by `offset` seconds."""
+    result = json.loads(result)
+    return [{
+        "start": word["start"] + offset,
+        "end": word["end"] + offset,
+        "text": word["word"]
+    } for word in result.get("result") or []]
+
+def _recognize_pcm(model, stream, offset: float = 0.0) -> list[dict]:
+    """
+    Runs a Vosk recognizer over a 16 kHz mono PCM stream, reading it in large buffers.
+    """
+    rec = vosk.KaldiRecognizer(model, PCM_SAMPLE_RATE)
+    rec.SetWords(True)
+    segments = []
+    while True:
+        data = stream.read(PCM_BUFFER_BYTES)
+        if len(data) == 0:
+            break
+        if rec.AcceptWaveform(data):
+            segments.extend(_vosk_words(rec.Result(), offset))
+    segments.extend(_vosk_words(rec.FinalResult(), offset))
+    return segments
+
+def transcribe_stream_vosk(media_path: str, model_name: str = None) -> list[dict]:
+    """
+    Transcribe a video's audio using Vosk, reading PCM straight from an ffmpeg pipe
+    instead of an extracted WAV file.
+    """
+    if model_name is None:
+        model_name = "vosk-model-small-en-us-0.15"
+        logging.info(f"No Vosk model specified. Using default model instead.")
+    model = get_model("vosk", model_name)
+    logging.info(f"Starting streaming Vosk transcription for {media_path} with model {model_name}")
+    start = time.perf_counter()
+    segments = _recognize_stream(model, _open_pcm_stream(media_path))
+    logging.info(f"Vosk transcription completed for {media_path} in {time.perf_counter() - start:.1f}s")
+    return segments
+
+def _vosk_chunk_worker(media_path: str, model_name: str, start: float, end: float) -> list[dict]:
+    """
+    Process pool entry point: recognizes one chunk of the audio, with timestamps in global time.
+    The model is loaded once per worker process and reused for its next chunks.
+    """
+    model = get_model("vosk", model_name)
+    return _recognize_stream(model, _open_pcm_stream(media_path, start=start, duration=end - start), offset=start)
+
+def transcribe_parallel_vosk(media_path: str, model_name: str = None, workers: int = None,
+                             chunk_seconds: float = None) -> list[dict]:
+    """
+    Transcribe a video's audio using Vosk in a process pool. The audio is split at silences
+    into chunks of about `chunk_seconds`, recognized concurrently and stitched back in order.
+
+    Args:
+        media_path (str): Path to the video or audio file.
+        model_name (str): Name of the Vosk model.
+        workers (int): Number of worker processes. Defaults to config.TRANSCRIBE_WORKERS.
+        chunk_seconds (float): Target chunk length. Defaults to config.TRANSCRIBE_CHUNK_SECONDS.
+
+    Returns:
+        list[dict]: Subtitle-ready segments with start, end, and text.
+    """
+    if model_name is None:
+        model_name = "vosk-model-small-en-us-0.15"
+        logging.info(f"No Vosk model specified. Using default model instead.")
+    workers = workers or config.TRANSCRIBE_WORKERS
+    chunk_seconds = chunk_seconds or config.TRANSCRIBE_CHUNK_SECONDS
+    duration = get_video_duration(media_path)
+    if not duration:
+        logging.warning("Could not get the audio duration. Falling back to streaming transcription.")
+        return transcribe_stream_vosk(media_path, model_name=model_name)
+    chunks = plan_chunks(duration, detect_silences(media_path), chunk_seconds)
+    logging.info(f"Starting Vosk transcription for {media_path} in {len(chunks)} chunks with {workers} workers")
+    start = time.perf_counter()
+    ctx = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as executor:
+            results = executor.map(_vosk_chunk_worker, [media_path] * len(chunks), [model_name] * len(chunks),
+                                   [chunk[0] for chunk in chunks], [chunk[1] for chunk in chunks])
+            segments = [segment for chunk_segments in results for segment in chunk_segments]
+    except Exception as e:
+        logging.error(f"Parallel Vosk transcription failed: {e}. Falling back to streaming transcription.")
+        return transcribe_stream_vosk(media_path, model_name=model_name)
+    logging.info(f"Vosk transcription completed for {media_path} in {time.perf_counter() - start:.1f}s")
     return segments
 
 def transcribe_audio_assemblyai(audio_path: str, assemblyai_key: str) -> list[dict]:
@@ -192,47 +390,95 @@ def transcribe_audio_assemblyai(audio_path: str, assemblyai_key: str) -> list[di
     except Exception as e:
         logging.error(f"AssemblyAI transcription failed: {e}")
         return []
-def get_transcript(downloaded_path: str, video_url: str = None, transcriber: str = "vosk", model: str = None, assemblyai_token: str = None) -> list[dict]:
+def get_official_transcript(video_url: str, language: str = "en") -> list[dict]:
+    """
+    Returns the official transcript of a YouTube video, or an empty list if the input is not
+    a YouTube link or the video has none. Needs only the URL, not the downloaded video.
+    """
+    # Check if video_url contains a valid YouTube URL
+    if not video_url or "youtube.com" not in video_url:
+        #logging.warning("Input is not a YouTube link. Skipping official transcript check.")
+        return []
+    # Check if the video has an official transcript
+    video_id = youtube_url_to_id(video_url)
+    transcript = fetch_official_transcript(video_id, language_code=language)
+    if transcript:
+        logging.info("Using official YouTube transcript.")
+    return transcript or []
+
+def uses_extracted_audio(transcriber: str) -> bool:
+    """Returns False if the transcriber decodes the audio from the video itself and ignores an extracted WAV."""
+    return not (transcriber == "vosk" and config.VOSK_MODE in ("stream", "parallel"))
+
+def get_transcript(downloaded_path: str, video_url: str = None, transcriber: str = "vosk", model: str = None, assemblyai_token: str = None, language: str = "en", audio_path: str = None, check_official: bool = True) -> list[dict]:
     """
     Get the transcript of a video using one of the following methods:
     - Official YouTube transcript (if available)
+    - Local transcript store (if this audio was transcribed before with the same transcriber and model)
     - Vosk (default)
     - Whisper
     - AssemblyAI
     Args:
         downloaded_path: str: Path to the downloaded video file.
         video_url: str: URL of the video to transcribe.
+        language: str: Language of the transcript.
+        audio_path: str: Already extracted 16 kHz mono WAV of the video (see processors.analyze_source). Extracted if not given.
+        check_official: bool: Set to False if the caller already looked up the official transcript (see get_official_transcript).
     
     Returns:
         list[dict]: A list of subtitle-ready segments with start, end, and text
     """
-    # Check if video_url contains a valid YouTube URL
-    if "youtube.com" not in video_url:
-        #logging.warning("Input is not a YouTube link. Skipping official transcript check.")
-        video_url = None
-    # Check if the video has an official transcript
-    video_id = youtube_url_to_id(video_url)
-    transcript = fetch_official_transcript(video_id)
-    if transcript:
-        logging.info("Using official YouTube transcript.")
+    if check_official:
+        transcript = get_official_transcript(video_url, language=language)
+        if transcript:
+            return transcript
+
+    # Check the transcript store before paying for audio extraction and transcription
+    store, audio_hash = None, None
+    if config.TRANSCRIPT_STORE_DIR:
+        store = TranscriptStore()
+        audio_hash = audio_content_hash(downloaded_path)
+        if audio_hash:
+            transcript = store.get(audio_hash, transcriber, model, language)
+            if transcript:
+                logging.info(f"Using stored {transcriber} transcript.")
+                return transcript
+
+    # Vosk can read the audio straight from ffmpeg, without an intermediate WAV file
+    if transcriber == "vosk" and config.VOSK_MODE == "stream":
+        transcript = transcribe_stream_vosk(downloaded_path, model_name=model)
+    elif transcriber == "vosk" and config.VOSK_MODE == "parallel":
+        transcript = transcribe_parallel_vosk(downloaded_path, model_name=model)
     else:
-        # Extracting Audio
+        transcript = _transcribe_extracted_audio(downloaded_path, transcriber, model, assemblyai_token, audio_path=audio_path)
+
+    if transcript and store and audio_hash:
+        store.put(audio_hash, transcriber, model, language, transcript)
+    return transcript
+
+def _transcribe_extracted_audio(downloaded_path: str, transcriber: str, model: str, assemblyai_token: str, audio_path: str = None) -> list[dict]:
+    """
+    Extracts the audio of a video to a WAV file, unless it is given, and transcribes it.
+    """
+    # Extracting Audio
+    if audio_path is None:
         logging.info("Extracting audio from video...")
         audio_path = extract_audio(downloaded_path)
-        if not audio_path:
-            logging.error("Could not extract audio. Exiting.")
-            return
-        
-        # Transcribing Audio
+    if not audio_path:
+        logging.error("Could not extract audio. Exiting.")
+        return
+    
+    # Transcribing Audio
 
-        if transcriber == "assemblyai":
-            logging.info("Transcribing audio with AssemblyAI...")
-            transcript = transcribe_audio_assemblyai(audio_path, assemblyai_token)
-        elif transcriber == "vosk":
-            transcript = transcribe_audio_vosk(audio_path, model_name=model)
-            return transcript
+    if transcriber == "assemblyai":
+        logging.info("Transcribing audio with AssemblyAI...")
+        transcript = transcribe_audio_assemblyai(audio_path, assemblyai_token)
+    elif transcriber == "vosk":
+        transcript = transcribe_audio_vosk(audio_path, model_name=model)
+    else:
+        logging.info("Transcribing audio with Whisper...")
+        if config.WHISPER_MODE == "parallel":
+            transcript = transcribe_parallel_whisper(audio_path, model_name=model)
         else:
-            logging.info("Transcribing audio with Whisper...")
             transcript = transcribe_audio_whisper(audio_path, model_name=model)
-    
-    return transcript
\ No newline at end of file
+    return transcript
@@ -0,0 +1,39 @@
+import numpy as np
+
+class TranscriptIndex:
+    """
+    Sorted, array-backed interval index over a transcript.
+    Built once per video, it returns the entries overlapping a time range in O(log n + k)
+    instead of scanning the whole transcript for every scene.
+    """
+
+    def __init__(self, transcript: list[dict]):
+        transcript = transcript or []
+        starts = np.array([entry["start"] for entry in transcript], dtype=np.float64)
+        order = np.argsort(starts, kind="stable")
+        self.entries = [transcript[idx] for idx in order]
+        self.starts = starts[order]
+        ends = np.array([entry["end"] for entry in self.entries], dtype=np.float64)
+        self.ends = ends
+        # Running maximum of the end times: non-decreasing, so it can be binary searched
+        # even when entries overlap (e.g. segment-level official transcripts).
+        self.max_ends = np.maximum.accumulate(ends) if len(ends) else ends
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def overlapping(self, start: float, end: float) -> list[dict]:
+        """
+        Returns the entries overlapping the (start, end) range, sorted by start time.
+
+        Args:
+            start (float): Start of the range in seconds.
+            end (float): End of the range in seconds.
+
+        Returns:
+            list[dict]: The overlapping entries, in global time.
+        """
+        # Entries starting before `end` form a prefix, entries that can end after `start` a suffix
+        hi = int(np.searchsorted(self.starts, end, side="left"))
+        lo = int(np.searchsorted(self.max_ends, start, side="right"))
+        return [self.entries[idx] for idx in range(lo, hi) if self.ends[idx] > start]
@@ -0,0 +1,185 @@
+import os
+import sys
+import gzip
+import json
+import time
+import hashlib
+import logging
+import argparse
+import subprocess
+import utils.config as config
+
+def audio_content_hash(video_path: str) -> str:
+    """
+    Returns the SHA-256 of the first audio stream's packets, read with stream copy (no decoding).
+    Identifies the audio content independently of the container, the video stream or the file name,
+    and does not require extracting the audio first.
+
+    Args:
+        video_path (str): Path to the video file.
+
+    Returns:
+        str: The hash, or None if the audio stream could not be read.
+    """
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-i", video_path,
+        "-map", "0:a:0", "-c", "copy",
+        "-f", "hash", "-hash", "sha256", "-"
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        logging.error(f"Could not hash the audio of {video_path}: {e.stderr}")
+        return None
+    for line in result.stdout.splitlines():
+        if line.startswith("SHA256="):
+            return line.split("=", 1)[1].strip()
+    return None
+
+class TranscriptStore:
+    """
+    On-disk store of transcripts keyed by (audio content hash, transcriber, model, language).
+    Entries are gzipped JSON with one array per field. Once the store grows past `max_bytes`,
+    the least recently used entries are evicted.
+    """
+
+    SUFFIX = ".json.gz"
+
+    def __init__(self, directory: str = None, max_bytes: int = None):
+        self.directory = directory or config.TRANSCRIPT_STORE_DIR
+        self.max_bytes = config.TRANSCRIPT_STORE_MAX_BYTES if max_bytes is None else max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(audio_hash: str, transcriber: str, model: str, language: str) -> str:
+        return hashlib.sha256(f"{audio_hash}|{transcriber}|{model}|{language}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}{self.SUFFIX}")
+
+    def get(self, audio_hash: str, transcriber: str, model: str, language: str) -> list[dict]:
+        """
+        Returns the stored transcript, or None if there is no entry for these parameters.
+        """
+        path = self._path(self.make_key(audio_hash, transcriber, model, language))
+        if not os.path.exists(path):
+            return None
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Discarding unreadable transcript store entry {path}: {e}")
+            os.remove(path)
+            return None
+        os.utime(path)  # Mark as recently used
+        return [{"start": start, "end": end, "text": text}
+                for start, end, text in zip(data["start"], data["end"], data["text"])]
+
+    def put(self, audio_hash: str, transcriber: str, model: str, language: str, transcript: list[dict]):
+        """
+        Stores a transcript, then evicts old entries if the store is over its size limit.
+        """
+        key = self.make_key(audio_hash, transcriber, model, language)
+        data = {
+            "meta": {
+                "audio_hash": audio_hash,
+                "transcriber": transcriber,
+                "model": model,
+                "language": language,
+                "created_at": time.time(),
+            },
+            "start": [entry["start"] for entry in transcript],
+            "end": [entry["end"] for entry in transcript],
+            "text": [entry["text"] for entry in transcript],
+        }
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+        logging.info(f"Transcript stored: {key[:12]} ({len(transcript)} entries)")
+        self.prune()
+
+    def entries(self) -> list[dict]:
+        """
+        Returns the stored entries, most recently used first.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            stat = os.stat(path)
+            entries.append({
+                "key": name[:-len(self.SUFFIX)],
+                "path": path,
+                "size": stat.st_size,
+                "last_used": stat.st_mtime,
+            })
+        return sorted(entries, key=lambda entry: entry["last_used"], reverse=True)
+
+    def read_meta(self, key: str) -> dict:
+        with gzip.open(self._path(key), "rt", encoding="utf-8") as f:
+            return json.load(f).get("meta", {})
+
+    def remove(self, key: str) -> bool:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return False
+        os.remove(path)
+        return True
+
+    def prune(self, max_bytes: int = None) -> int:
+        """
+        Evicts the least recently used entries until the store fits in `max_bytes`.
+
+        Returns:
+            int: The number of evicted entries.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(entry["size"] for entry in entries)
+        evicted = 0
+        while entries and total > max_bytes:
+            entry = entries.pop()
+            os.remove(entry["path"])
+            total -= entry["size"]
+            evicted += 1
+            logging.info(f"Evicted transcript {entry['key'][:12]} from the store.")
+        return evicted
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.transcript_store", description="Manage the local transcript store.")
+    parser.add_argument("--dir", default=None, help="Store directory (default: config.TRANSCRIPT_STORE_DIR)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="List stored transcripts, most recently used first")
+    prune = commands.add_parser("prune", help="Evict least recently used transcripts")
+    prune.add_argument("--max-bytes", type=int, default=None, help="Size to prune down to (default: config.TRANSCRIPT_STORE_MAX_BYTES)")
+    remove = commands.add_parser("remove", help="Remove a stored transcript")
+    remove.add_argument("key", help="Key (or unique key prefix) of the transcript")
+    args = parser.parse_args(argv)
+
+    store = TranscriptStore(args.dir)
+    if args.command == "list":
+        entries = store.entries()
+        for entry in entries:
+            meta = store.read_meta(entry["key"])
+            last_used = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["last_used"]))
+            print(f"{entry['key'][:12]}  {entry['size'] / 1024:8.1f} KiB  {last_used}  "
+                  f"{meta.get('transcriber')}/{meta.get('model')}/{meta.get('language')}")
+        print(f"{len(entries)} transcripts, {sum(entry['size'] for entry in entries) / 1024 / 1024:.1f} MiB")
+    elif args.command == "prune":
+        print(f"Evicted {store.prune(args.max_bytes)} transcripts.")
+    elif args.command == "remove":
+        matches = [entry["key"] for entry in store.entries() if entry["key"].startswith(args.key)]
+        if len(matches) != 1:
+            print(f"{len(matches)} transcripts match '{args.key}'.", file=sys.stderr)
+            return 1
+        store.remove(matches[0])
+        print(f"Removed {matches[0]}.")
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
+    sys.exit(main())
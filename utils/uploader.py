@@ -1,16 +1,21 @@
 import os
+import re
 import logging
 from utils.youtube import get_youtube_service, upload_scene
-from utils.log_utils import log_uploaded_video, log_failed_upload, get_uploaded_videos
-from time import sleep
-from typing import List, Any
+from utils.log_utils import log_uploaded_video, log_failed_upload, log_queued_upload, get_queued_uploads, is_uploaded, set_status
+from utils.quota import remaining_uploads, charge_units, mark_exhausted, pace_request, log_quota_status
+from typing import List, Any, Iterable
+import queue
+import threading
 import shutil
+import utils.config as config
 
-def upload_videos(videos: List[str], target: str, youtube_service: Any=None, delete_after_upload: bool=False)->bool:
+def upload_videos(videos: List[tuple], target: str, youtube_service: Any=None, delete_after_upload: bool=False)->bool:
     """
     Uploads video scenes to YouTube.
     Args:
-        videos (List[str]): List of video scene file paths to upload.
+        videos (List[tuple]): (scene index, path) of each scene to upload, see render.prepare_shorts and index_scenes.
+            The scene index numbers the part in the title.
         target (str): Target directory where the videos are located.
         youtube_service (Any): YouTube Data API service object. If None, it will be created.
         delete_after_upload (bool): If True, delete the local video file after successful upload.
@@ -30,38 +35,78 @@ def upload_videos(videos: List[str], target: str, youtube_service: Any=None, del
     if not youtube_service:
         logging.error("YouTube service object is None. Exiting upload.")
         return False
-    uploaded_videos = get_uploaded_videos()
-    # Main loop to upload videos
-    for idx, scene in enumerate(videos):
-        if scene in uploaded_videos:
-            logging.info(f"Video {scene} already uploaded. Skipping...")
-            if delete_after_upload:
-                try:
-                    os.remove(scene)
-                    logging.info(f"Scene {idx+1} deleted. Path: {scene}")
-                except Exception as e:
-                    logging.error(f"Error deleting scene {idx+1}: {e}")
-            continue
-        success, limit = upload_scene(scene_path=scene, idx=idx, dir_name=target, youtube_service=youtube_service)
-        if not success:
-            log_failed_upload(scene)
-            if limit:
-                break
-            else:
-                continue
-        log_uploaded_video(scene)
+    log_quota_status()
+    # Main loop to upload videos. Once the quota is used up, the remaining scenes are queued for the next quota day
+    for idx, scene in videos:
+        _upload_or_skip(scene, idx, target, youtube_service, delete_after_upload)
+
+    _delete_target_if_empty(target)
+    return True
+
+def index_scenes(paths: List[str]) -> List[tuple]:
+    """
+    Pairs scene files with their scene index, read from the scene_<n>.mp4 name given by the renderers,
+    so parts are numbered the same as when they were uploaded right after rendering.
+    Files with another name are numbered after the rendered scenes, in order.
+    Returns:
+        List[tuple]: (scene index, path) pairs, in scene order.
+    """
+    indexed, others = [], []
+    for path in paths:
+        match = re.fullmatch(r"scene_(\d+)\.mp4", os.path.basename(path))
+        if match:
+            indexed.append((int(match.group(1)) - 1, path))
+        else:
+            others.append(path)
+    indexed.sort()
+    first_free = indexed[-1][0] + 1 if indexed else 0
+    return indexed + [(first_free + n, path) for n, path in enumerate(others)]
 
-        #Delete local file after successful upload
+def _upload_or_skip(scene: str, idx: int, target: str, youtube_service: Any, delete_after_upload: bool) -> tuple:
+    """
+    Uploads one scene unless the ledger already has it, records the result and deletes the file if asked.
+    If the remaining quota of the day does not allow another upload, the scene is queued instead,
+    without calling the API.
+    Returns:
+        tuple: (bool, bool) - (uploaded now, upload limit reached)
+    """
+    if is_uploaded(scene):
+        logging.info(f"Video {scene} already uploaded. Skipping...")
         if delete_after_upload:
-            try:
-                os.remove(scene)
-                logging.info(f"Scene {idx+1} deleted. Path: {scene}")
-            except Exception as e:
-                logging.error(f"Error deleting scene {idx+1}: {e}")
-        if idx < len(videos) - 1:
-            sleep(10) # Delay before the next upload.
+            _delete_scene(scene, idx)
+        return False, False
+    if remaining_uploads() < 1:
+        logging.info(f"No upload quota left today. Queued {scene} for the next quota day.")
+        log_queued_upload(scene, target, idx)
+        return False, True
+    pace_request()
+    video_id, limit, error, api_called = upload_scene(scene_path=scene, idx=idx, dir_name=target, youtube_service=youtube_service)
+    if api_called:  # Local failures (missing file, no service) cost no quota
+        charge_units(config.UPLOAD_COST_UNITS)
+    if limit:
+        # The API knows better than the local count, e.g. when other tools share the project
+        mark_exhausted()
+        log_queued_upload(scene, target, idx)
+        return False, True
+    if not video_id:
+        log_failed_upload(scene, error=error)
+        return False, False
+    log_uploaded_video(scene, video_id=video_id)
+
+    #Delete local file after successful upload
+    if delete_after_upload:
+        _delete_scene(scene, idx)
+    return True, False
+
+def _delete_scene(scene: str, idx: int):
+    try:
+        os.remove(scene)
+        logging.info(f"Scene {idx+1} deleted. Path: {scene}")
+    except Exception as e:
+        logging.error(f"Error deleting scene {idx+1}: {e}")
 
-        #If scenes directory is empty, delete the original video directory, job is done.
+def _delete_target_if_empty(target: str):
+    #If scenes directory is empty, delete the original video directory, job is done.
     if not os.listdir(target):
         logging.info(f"Scenes directory is empty. Deleting original video directory: {target}")
         try:
@@ -69,4 +114,102 @@ def upload_videos(videos: List[str], target: str, youtube_service: Any=None, del
             logging.info(f"Original video directory deleted: {target}")
         except Exception as e:
             logging.error(f"Error deleting original video directory: {e}")
-    return True
\ No newline at end of file
+
+def upload_stream(scene_queue: queue.Queue, target: str, youtube_service: Any, delete_after_upload: bool=False) -> bool:
+    """
+    Uploads scenes as they are put in the queue, until it receives None.
+    Applies the same ledger, quota and deletion rules as upload_videos. Once the quota is used up,
+    the remaining scenes are still taken from the queue, so rendering is not blocked, and queued
+    for the next quota day.
+    Args:
+        scene_queue (queue.Queue): (scene index, path) of each rendered scene, then None.
+        target (str): Target directory where the videos are located.
+        youtube_service (Any): YouTube Data API service object.
+        delete_after_upload (bool): If True, delete the local video file after successful upload.
+    Returns:
+        bool: True if at least one scene came through the queue, False otherwise.
+    """
+    received = 0
+    while True:
+        item = scene_queue.get()
+        if item is None:
+            break
+        # The scene index, not the arrival order, numbers the part: scenes can finish out of order or be skipped
+        idx, scene = item
+        _upload_or_skip(scene, idx, target, youtube_service, delete_after_upload)
+        received += 1
+    if not received:
+        logging.error("No scene videos found. Exiting.")
+        return False
+    if os.path.exists(target):
+        _delete_target_if_empty(target)
+    return True
+
+def render_and_upload(scenes: Iterable[tuple], target: str, youtube_service: Any, delete_after_upload: bool=False,
+                      queue_size: int = None) -> bool:
+    """
+    Uploads scenes while they are being rendered. The scenes are consumed here and handed to an uploader
+    thread through a bounded queue: when the uploads fall behind, rendering waits, so only a few finished
+    shorts are on disk at a time.
+    Args:
+        scenes (Iterable[tuple]): (scene index, path) of each rendered scene, see render.iter_shorts.
+        target (str): Target directory where the videos are located.
+        youtube_service (Any): YouTube Data API service object.
+        delete_after_upload (bool): If True, delete the local video file after successful upload.
+        queue_size (int): Rendered scenes waiting for upload at most. Defaults to config.UPLOAD_QUEUE_SIZE.
+    Returns:
+        bool: The result of upload_stream.
+    """
+    scene_queue = queue.Queue(maxsize=queue_size or config.UPLOAD_QUEUE_SIZE)
+    result = {}
+
+    def uploader():
+        try:
+            result["success"] = upload_stream(scene_queue, target, youtube_service, delete_after_upload)
+        except Exception as e:
+            logging.error(f"Uploader stopped: {e}")
+            while scene_queue.get() is not None:  # Keep taking scenes so rendering is not blocked
+                pass
+
+    thread = threading.Thread(target=uploader, name="uploader", daemon=True)
+    thread.start()
+    try:
+        for item in scenes:
+            scene_queue.put(item)
+    finally:
+        scene_queue.put(None)
+        thread.join()
+    return result.get("success", False)
+
+def drain_upload_queue(youtube_service: Any=None, delete_after_upload: bool=False) -> int:
+    """
+    Uploads the scenes queued when the quota ran out, oldest first, as far as today's quota allows.
+    Scenes whose file is gone are marked as failed.
+    Args:
+        youtube_service (Any): YouTube Data API service object. If None, it will be created.
+        delete_after_upload (bool): If True, delete the local video file after successful upload.
+    Returns:
+        int: The number of uploaded scenes, or -1 if the YouTube service could not be created.
+    """
+    queued = get_queued_uploads()
+    log_quota_status()
+    if not queued:
+        logging.info("Upload queue is empty.")
+        return 0
+    if youtube_service is None:
+        youtube_service = get_youtube_service()
+    if not youtube_service:
+        logging.error("YouTube service object is None. Exiting upload.")
+        return -1
+    uploaded = 0
+    for entry in queued:
+        if not os.path.exists(entry["path"]):
+            logging.warning(f"Queued scene {entry['path']} no longer exists.")
+            set_status(entry["content_hash"], "failed", error="file missing")
+            continue
+        success, limit = _upload_or_skip(entry["path"], entry["part"], entry["target"], youtube_service, delete_after_upload)
+        uploaded += success
+        if limit:
+            break
+    logging.info(f"Uploaded {uploaded} queued scenes, {len(get_queued_uploads())} left in the queue.")
+    return uploaded
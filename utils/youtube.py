@@ -5,8 +5,17 @@ from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from googleapiclient.errors import HttpError
 import os
+import json
+import time
+import random
+import threading
 import logging
-from utils.config import SCOPES
+import httplib2
+from utils.config import SCOPES, UPLOAD_CHUNK_SIZE, UPLOAD_MAX_RETRIES
+from utils.checkpoint import get_upload_session, set_upload_session, clear_upload_session
+
+RETRYABLE_STATUS_CODES = (500, 502, 503, 504)
+RETRYABLE_EXCEPTIONS = (httplib2.HttpLib2Error, OSError)
 
 def get_credentials():
     """
@@ -53,6 +62,20 @@ def get_youtube_service():
     youtube = build("youtube", "v3", credentials=creds, cache_discovery=False)
     return youtube
 
+_local = threading.local()
+
+def get_cached_youtube_service():
+    """
+    Returns this thread's YouTube Data API service object, creating it on first use.
+    Lets consecutive jobs skip the credential loading and the discovery build; the object is
+    not shared between threads because its HTTP client is not thread-safe.
+    """
+    youtube = getattr(_local, "youtube", None)
+    if youtube is None:
+        youtube = get_youtube_service()
+        _local.youtube = youtube
+    return youtube
+
 def upload_video_to_youtube(video_path, title, description, tags, youtube_service):
     """
     Uploads a video to YouTube using the given youtube_service.
@@ -72,17 +95,9 @@ def upload_video_to_youtube(video_path, title, description, tags, youtube_servic
         }
     }
     
-    media = MediaFileUpload(video_path, chunksize=-1, resumable=True)
-    
-    #youtube_service = get_youtube_service() if youtube_service is None else youtube_service
-    request = youtube_service.videos().insert(
-        part="snippet,status",
-        body=body,
-        media_body=media
-    )
     response = None
     try:
-        response = request.execute()
+        response = _upload_resumable(video_path, body, youtube_service)
         print(f"Upload successful! Video ID: {response.get('id')}")
         return response
     except HttpError as e:
@@ -99,7 +114,94 @@ def upload_video_to_youtube(video_path, title, description, tags, youtube_servic
         logging.error(f"An unexpected error occurred: {e}")
         raise
 
-def upload_scene(scene_path: str, idx: int, dir_name: str, youtube_service) -> bool:
+def _upload_resumable(video_path: str, body: dict, youtube_service) -> dict:
+    """
+    Uploads a video in chunks of UPLOAD_CHUNK_SIZE bytes over a resumable session.
+    Network errors and 500/502/503/504 responses are retried with exponential backoff. The session URI
+    is saved, so after a restart the upload continues from the last byte the server received.
+    If the saved session has expired, the upload starts over.
+    """
+    session_uri = get_upload_session(video_path)
+    request = _insert_request(video_path, body, youtube_service)
+    try:
+        response = None
+        if session_uri:
+            logging.info(f"Resuming the interrupted upload of {video_path}...")
+            request.resumable_uri = session_uri
+            response = _query_upload_status(request, video_path)
+        if response is None:
+            response = _send_chunks(request, video_path)
+    except HttpError as e:
+        if not session_uri or e.resp.status not in (404, 410):
+            raise
+        logging.warning(f"Upload session of {video_path} expired. Starting the upload over.")
+        clear_upload_session(video_path)
+        request = _insert_request(video_path, body, youtube_service)
+        response = _send_chunks(request, video_path)
+    clear_upload_session(video_path)
+    return response
+
+def _insert_request(video_path: str, body: dict, youtube_service):
+    media = MediaFileUpload(video_path, chunksize=UPLOAD_CHUNK_SIZE, resumable=True)
+    return youtube_service.videos().insert(
+        part="snippet,status",
+        body=body,
+        media_body=media
+    )
+
+def _query_upload_status(request, video_path: str) -> dict:
+    """
+    Asks the server how many bytes of an interrupted resumable upload it has (an empty PUT with
+    Content-Range: bytes */<size>) and moves the request to that offset.
+
+    Returns:
+        dict: The uploaded video if the server already has the whole file, else None.
+    """
+    size = os.path.getsize(video_path)
+    resp, content = request.http.request(request.resumable_uri, method="PUT",
+                                         headers={"Content-Length": "0", "Content-Range": f"bytes */{size}"})
+    if resp.status in (200, 201):
+        return json.loads(content)
+    if resp.status != 308:
+        raise HttpError(resp, content, uri=request.resumable_uri)
+    # Range: bytes=0-<last byte received>, missing if the server has nothing yet
+    received = resp.get("range")
+    request.resumable_progress = int(received.rsplit("-", 1)[1]) + 1 if received else 0
+    logging.info(f"Server has {request.resumable_progress}/{size} bytes of {os.path.basename(video_path)}.")
+    return None
+
+def _send_chunks(request, video_path: str) -> dict:
+    """Sends the chunks of a resumable upload request, retrying transient failures."""
+    saved_uri = request.resumable_uri
+    response = None
+    retry = 0
+    while response is None:
+        try:
+            status, response = request.next_chunk()
+            retry = 0
+            if status:
+                logging.info(f"Uploading {os.path.basename(video_path)}: {status.progress():.0%}")
+        except HttpError as e:
+            if e.resp.status not in RETRYABLE_STATUS_CODES:
+                raise
+            error, last_exception = f"HTTP {e.resp.status}", e
+        except RETRYABLE_EXCEPTIONS as e:
+            error, last_exception = str(e) or type(e).__name__, e
+        else:
+            error = None
+        if request.resumable_uri and request.resumable_uri != saved_uri:
+            set_upload_session(video_path, request.resumable_uri)
+            saved_uri = request.resumable_uri
+        if error and response is None:
+            retry += 1
+            if retry > UPLOAD_MAX_RETRIES:
+                raise RuntimeError(f"Upload of {video_path} failed after {UPLOAD_MAX_RETRIES} retries: {error}") from last_exception
+            delay = min(2 ** retry, 64) + random.random()
+            logging.warning(f"Retryable upload error ({error}), retrying in {delay:.1f}s ({retry}/{UPLOAD_MAX_RETRIES})...")
+            time.sleep(delay)
+    return response
+
+def upload_scene(scene_path: str, idx: int, dir_name: str, youtube_service) -> tuple:
     """
     Uploads a scene video to YouTube.
     Args:
@@ -108,7 +210,8 @@ def upload_scene(scene_path: str, idx: int, dir_name: str, youtube_service) -> b
         vid_name (str): Name of the video.
         youtube_service: YouTube Data API service object.
     Returns:
-        tuple: (bool, bool) - (success, limit_reached)
+        tuple: (str, bool, str, bool) - (YouTube video ID, None if the upload failed; limit_reached;
+            error message, None on success; api_called, False if it failed before any API request, so no quota was used)
     """
     logging.info(f"Uploading scene {idx+1} to YouTube...")
     vid_name = os.path.basename(dir_name).replace("_", " ")
@@ -121,12 +224,14 @@ def upload_scene(scene_path: str, idx: int, dir_name: str, youtube_service) -> b
         if response == {"error": "uploadLimitExceeded"}:
             logging.warning("Daily upload limit reached. Stopping uploads.")
             limit_reached = True
-            return False, limit_reached
+            return None, limit_reached, "uploadLimitExceeded", True
         if response == {'error': 'youtube_service_none'}:
             logging.error("YouTube service object is None. Exiting upload.")
-            return False, limit_reached
+            return None, limit_reached, "YouTube service object is None", False
         logging.info(f"Scene {idx+1} uploaded to YouTube.")
-        return True, limit_reached
+        return response.get("id"), limit_reached, None, True
     except Exception as e:
         logging.error(f"Error uploading scene {idx+1}: {e}")
-        return False, limit_reached
\ No newline at end of file
+        # The API answered (an error response, possibly after retries): the request counts against the quota
+        api_called = isinstance(e, HttpError) or isinstance(e.__cause__, HttpError)
+        return None, limit_reached, str(e) or type(e).__name__, api_called
\ No newline at end of file